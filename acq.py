@@ -1,13 +1,43 @@
 import time
 import random
+import logging
+import numpy as np
 import nidaqmx
 import nidaqmx
 from nidaqmx.constants import AcquisitionType, TerminalConfiguration, Edge
 from nidaqmx.stream_writers import AnalogMultiChannelWriter
+from nidaqmx.stream_readers import AnalogSingleChannelReader
+from simulation import resolve_backend, SimulatedDetectorTask, SyntheticSpecimen
+
+logger = logging.getLogger(__name__)
+
+
+def voltages_to_gray_levels(voltages: np.ndarray, min_voltage: float, max_voltage: float,
+                            out: np.ndarray = None) -> np.ndarray:
+    """
+    Convertit des tensions détecteur en niveaux de gris flottants [0–255].
+
+    Le calcul est fait sur place dans `out` (qui peut être `voltages` lui-même).
+
+    Args:
+        voltages (np.ndarray): Tensions lues.
+        min_voltage (float): Tension correspondant au noir.
+        max_voltage (float): Tension correspondant au blanc.
+        out (np.ndarray): Tableau de sortie, alloué si None.
+
+    Returns:
+        np.ndarray: Niveaux de gris (float), même forme que l'entrée.
+    """
+    out = np.clip(voltages, min_voltage, max_voltage, out=out)
+    out -= min_voltage
+    out *= 255 / (max_voltage - min_voltage)
+    return out
+
 
 class NiDetectorAcquisition:
 
-    def __init__(self, channel_read: str, min_voltage: float = 0.0, max_voltage: float = 10.0):
+    def __init__(self, channel_read: str, min_voltage: float = 0.0, max_voltage: float = 10.0,
+                 backend: str = None, simulated_task: SimulatedDetectorTask = None):
         """
         Initialise l'acquisition analogique avec nidaqmx.
 
@@ -15,20 +45,80 @@ class NiDetectorAcquisition:
             channel_read (str): Nom du canal analogique, ex: "Dev1/ai0"
             min_voltage (float): Tension minimale attendue.
             max_voltage (float): Tension maximale attendue.
-            response_time (float): Délai artificiel pour simuler le temps de réponse.
+            backend (str): "hardware" (nidaqmx) ou "sim" (détecteur simulé) ;
+                None = variable d'environnement OPC_BACKEND.
+            simulated_task (SimulatedDetectorTask): Détecteur simulé à utiliser en
+                mode "sim" (par défaut : spécimen de test piloté par "ASRL5::INSTR").
         """
         self.channel_read = channel_read
         self.min_voltage = min_voltage
         self.max_voltage = max_voltage
+        self.backend = resolve_backend(backend)
         #self.response_time = response_time
-        self.task = nidaqmx.Task()
-        self.task.ai_channels.add_ai_voltage_chan(
-            channel_read,
-            min_val=min_voltage,
-            max_val=max_voltage,
-            #terminal_config=TerminalConfiguration.DIFF
-            terminal_config=TerminalConfiguration.RSE
-        )
+        if self.backend == "sim":
+            self.task = simulated_task or SimulatedDetectorTask(
+                SyntheticSpecimen(min_voltage=min_voltage, max_voltage=max_voltage))
+            self.reader = self.task
+        else:
+            self.task = nidaqmx.Task()
+            self.task.ai_channels.add_ai_voltage_chan(
+                channel_read,
+                min_val=min_voltage,
+                max_val=max_voltage,
+                #terminal_config=TerminalConfiguration.DIFF
+                terminal_config=TerminalConfiguration.RSE
+            )
+            self.reader = AnalogSingleChannelReader(self.task.in_stream)
+        # Buffers réutilisés d'un appel à l'autre (agrandis si nécessaire)
+        self._voltages = np.empty(0, dtype=np.float64)
+        self._gray_levels = np.empty(0, dtype=np.float64)
+
+    def read_block(self, n: int) -> np.ndarray:
+        """
+        Lit `n` tensions en un seul appel au driver.
+
+        Args:
+            n (int): Nombre d'échantillons à lire.
+
+        Returns:
+            np.ndarray: Vue sur un buffer interne réutilisé (à copier pour la conserver).
+        """
+        if self._voltages.size < n:
+            self._voltages = np.empty(n, dtype=np.float64)
+        voltages = self._voltages[:n]
+        self.reader.read_many_sample(voltages, number_of_samples_per_channel=n)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s : %d échantillons, moyenne %.4f V", self.channel_read, n, voltages.mean())
+        return voltages
+
+    def read_gray_levels(self, n: int) -> np.ndarray:
+        """
+        Lit `n` échantillons et les convertit en niveaux de gris [0–255] (float).
+
+        Args:
+            n (int): Nombre d'échantillons à lire.
+
+        Returns:
+            np.ndarray: Vue sur un buffer interne réutilisé (à copier pour la conserver).
+        """
+        return self.gray_levels(self.read_block(n))
+
+    def gray_levels(self, voltages: np.ndarray) -> np.ndarray:
+        """
+        Convertit des tensions déjà lues en niveaux de gris [0–255] (float),
+        sans modifier `voltages`.
+
+        Args:
+            voltages (np.ndarray): Tensions, par exemple renvoyées par `read_block`.
+
+        Returns:
+            np.ndarray: Vue sur un buffer interne réutilisé (à copier pour la conserver).
+        """
+        n = voltages.size
+        if self._gray_levels.size < n:
+            self._gray_levels = np.empty(n, dtype=np.float64)
+        return voltages_to_gray_levels(voltages, self.min_voltage, self.max_voltage,
+                                       out=self._gray_levels[:n])
 
     def read_gray_level(self) -> int:
         """
@@ -42,7 +132,7 @@ class NiDetectorAcquisition:
         voltage = self.task.read()
         voltage_clamped = max(self.min_voltage, min(self.max_voltage, voltage))  # clamp entre 0 et 10 V
         gray_level = int(255 * (voltage_clamped - self.min_voltage) / (self.max_voltage - self.min_voltage))
-        print(voltage)
+        logger.debug("%s : %.4f V", self.channel_read, voltage)
 
         return gray_level
 
@@ -52,3 +142,179 @@ class NiDetectorAcquisition:
         self.task.close()
 
 
+class NiBufferedScan:
+    """
+    Balayage cadencé matériellement : les consignes X/Y sont écrites comme une
+    forme d'onde sur deux sorties analogiques et le détecteur est lu dans un
+    buffer fini, synchronisé sur l'horloge d'échantillonnage des sorties.
+
+    Le temps d'une image ne dépend alors plus de la latence série mais
+    uniquement de `sample_rate`.
+
+    Attributs :
+        channels_write (str) : Sorties analogiques X et Y, ex: "Dev2/ao0:1".
+        channel_read (str) : Entrée analogique du détecteur, ex: "Dev2/ai1".
+        sample_rate (float) : Fréquence d'échantillonnage en Hz.
+        volts_per_amp (float) : Gain de l'étage de commande des bobines (V/A).
+    """
+
+    def __init__(self, channels_write: str = "Dev2/ao0:1", channel_read: str = "Dev2/ai1",
+                 sample_rate: float = 100000.0, volts_per_amp: float = 10.0,
+                 min_voltage: float = 0.0, max_voltage: float = 10.0,
+                 ao_min_voltage: float = -10.0, ao_max_voltage: float = 10.0,
+                 backend: str = None, specimen: SyntheticSpecimen = None):
+        """
+        Args:
+            channels_write (str): Sorties analogiques (X puis Y).
+            channel_read (str): Entrée analogique du détecteur.
+            sample_rate (float): Fréquence d'échantillonnage (Hz), commune à AO et AI.
+            volts_per_amp (float): Conversion courant de consigne (A) -> tension AO (V).
+            min_voltage (float): Tension minimale attendue sur le détecteur.
+            max_voltage (float): Tension maximale attendue sur le détecteur.
+            ao_min_voltage (float): Tension minimale autorisée sur les sorties.
+            ao_max_voltage (float): Tension maximale autorisée sur les sorties.
+            backend (str): "hardware" (nidaqmx) ou "sim" (spécimen rendu à partir des
+                consignes, en temps réel) ; None = variable d'environnement OPC_BACKEND.
+            specimen (SyntheticSpecimen): Spécimen rendu en mode "sim".
+        """
+        self.channels_write = channels_write
+        self.channel_read = channel_read
+        self.sample_rate = sample_rate
+        self.volts_per_amp = volts_per_amp
+        self.min_voltage = min_voltage
+        self.max_voltage = max_voltage
+        self.ao_min_voltage = ao_min_voltage
+        self.ao_max_voltage = ao_max_voltage
+        # Nom du périphérique (ex: "Dev2") pour router l'horloge AO vers l'AI
+        self.device = channels_write.split("/")[0]
+        self.backend = resolve_backend(backend)
+        self.specimen = specimen or SyntheticSpecimen(min_voltage=min_voltage, max_voltage=max_voltage)
+        self._running = False
+
+    def acquire(self, x_signal: np.ndarray, y_signal: np.ndarray, chunk_sizes, on_chunk=None):
+        """
+        Joue les signaux X/Y et lit le détecteur, un bloc à la fois.
+
+        Les deux tâches sont configurées en mode fini sur le même nombre
+        d'échantillons ; l'entrée est cadencée par "ao/SampleClock" et démarrée
+        avant la sortie, de sorte que l'échantillon i lu correspond exactement
+        à la consigne i écrite.
+
+        Args:
+            x_signal (np.ndarray): Consignes X (A), un élément par échantillon.
+            y_signal (np.ndarray): Consignes Y (A), même longueur que X.
+            chunk_sizes (list[int]): Tailles successives des blocs lus
+                (typiquement un bloc par ligne). Leur somme doit valoir len(x_signal).
+            on_chunk (callable): Appelée avec (index_bloc, tensions) pour chaque bloc.
+                Le tableau passé est réutilisé : il faut le copier pour le conserver.
+
+        Returns:
+            bool: True si le balayage est allé jusqu'au bout, False s'il a été arrêté.
+        """
+        chunk_sizes = list(chunk_sizes)
+        n_samples = len(x_signal)
+        waveform = np.empty((2, n_samples), dtype=np.float64)
+        np.multiply(x_signal, self.volts_per_amp, out=waveform[0])
+        np.multiply(y_signal, self.volts_per_amp, out=waveform[1])
+        np.clip(waveform, self.ao_min_voltage, self.ao_max_voltage, out=waveform)
+
+        self._running = True
+        if self.backend == "sim":
+            return self._acquire_simulated(x_signal, y_signal, chunk_sizes, on_chunk)
+        completed = True
+        with nidaqmx.Task() as ao_task, nidaqmx.Task() as ai_task:
+            ao_task.ao_channels.add_ao_voltage_chan(
+                self.channels_write,
+                min_val=self.ao_min_voltage,
+                max_val=self.ao_max_voltage
+            )
+            ao_task.timing.cfg_samp_clk_timing(
+                self.sample_rate,
+                sample_mode=AcquisitionType.FINITE,
+                samps_per_chan=n_samples
+            )
+            ai_task.ai_channels.add_ai_voltage_chan(
+                self.channel_read,
+                min_val=self.min_voltage,
+                max_val=self.max_voltage,
+                terminal_config=TerminalConfiguration.RSE
+            )
+            ai_task.timing.cfg_samp_clk_timing(
+                self.sample_rate,
+                source=f"/{self.device}/ao/SampleClock",
+                active_edge=Edge.RISING,
+                sample_mode=AcquisitionType.FINITE,
+                samps_per_chan=n_samples
+            )
+
+            writer = AnalogMultiChannelWriter(ao_task.out_stream, auto_start=False)
+            writer.write_many_sample(waveform)
+            reader = AnalogSingleChannelReader(ai_task.in_stream)
+
+            # L'AI attend l'horloge de l'AO : elle doit être armée en premier
+            ai_task.start()
+            ao_task.start()
+
+            buffer = np.empty(max(chunk_sizes, default=0), dtype=np.float64)
+            for i_chunk, size in enumerate(chunk_sizes):
+                if not self._running:
+                    completed = False
+                    break
+                chunk = buffer[:size]
+                # Marge d'une seconde en plus de la durée théorique du bloc
+                reader.read_many_sample(chunk, number_of_samples_per_channel=size,
+                                        timeout=size / self.sample_rate + 1.0)
+                if on_chunk is not None:
+                    on_chunk(i_chunk, chunk)
+
+        self.park()
+        self._running = False
+        return completed
+
+    def _acquire_simulated(self, x_signal, y_signal, chunk_sizes, on_chunk):
+        """Équivalent simulé de `acquire` : chaque bloc dure size / sample_rate secondes."""
+        completed = True
+        start = 0
+        for i_chunk, size in enumerate(chunk_sizes):
+            if not self._running:
+                completed = False
+                break
+            chunk = self.specimen.render(x_signal[start:start + size], y_signal[start:start + size])
+            time.sleep(size / self.sample_rate)
+            if on_chunk is not None:
+                on_chunk(i_chunk, chunk)
+            start += size
+        self._running = False
+        return completed
+
+    def park(self):
+        """Ramène les deux sorties analogiques à 0 V (faisceau au repos)."""
+        if self.backend == "sim":
+            return
+        with nidaqmx.Task() as task:
+            task.ao_channels.add_ao_voltage_chan(
+                self.channels_write,
+                min_val=self.ao_min_voltage,
+                max_val=self.ao_max_voltage
+            )
+            task.write([0.0, 0.0])
+
+    def stop(self):
+        """Demande l'arrêt du balayage au prochain bloc."""
+        self._running = False
+
+    def voltages_to_gray(self, voltages: np.ndarray) -> np.ndarray:
+        """
+        Convertit des tensions détecteur en niveaux de gris flottants [0–255].
+
+        Args:
+            voltages (np.ndarray): Tensions lues.
+
+        Returns:
+            np.ndarray: Niveaux de gris (float), même forme que l'entrée.
+        """
+        return voltages_to_gray_levels(voltages, self.min_voltage, self.max_voltage)
+
+    def close(self):
+        """Arrête un éventuel balayage en cours (les tâches sont créées par balayage)."""
+        self.stop()
@@ -0,0 +1,214 @@
+import math
+import time
+from concurrent.futures import Future
+import numpy as np
+from PyQt6 import QtCore
+
+INV_PHI = (math.sqrt(5) - 1) / 2  # 1/nombre d'or
+
+
+def sharpness(frame: np.ndarray, roi=None, downsample: int = 2) -> float:
+    """
+    Mesure de netteté : variance du laplacien de l'image en niveaux de gris.
+
+    L'image (ou sa région `roi`) est d'abord réduite par moyenne de blocs
+    `downsample` x `downsample` (moins de bruit et de calcul), puis le
+    laplacien 4-voisins est calculé par décalages de tableaux numpy.
+
+    :param frame: Image (h, w) ou (h, w, 3)
+    :param roi: Région (x, y, largeur, hauteur) en pixels de l'image ; None = image entière
+    :param downsample: Facteur de réduction
+    :return: Score (plus grand = plus net)
+    """
+    if roi is not None:
+        x, y, width, height = roi
+        frame = frame[y:y + height, x:x + width]
+    height = frame.shape[0] - frame.shape[0] % downsample
+    width = frame.shape[1] - frame.shape[1] % downsample
+    if height < 3 * downsample or width < 3 * downsample:
+        raise ValueError("Région trop petite pour mesurer la netteté")
+    gray = frame[:height, :width].astype(np.float32)
+    if gray.ndim == 3:
+        gray = gray.mean(axis=2)
+    gray = gray.reshape(height // downsample, downsample, width // downsample, downsample).mean(axis=(1, 3))
+    laplacian = (4 * gray[1:-1, 1:-1] - gray[:-2, 1:-1] - gray[2:, 1:-1]
+                 - gray[1:-1, :-2] - gray[1:-1, 2:])
+    return float(laplacian.var())
+
+
+class AutofocusWorker(QtCore.QObject):
+    """
+    Mise au point automatique sur le courant de la lentille objectif.
+
+    1. Balayage grossier : `n_coarse` courants régulièrement répartis entre
+       `current_min` et `current_max`, une image notée (sharpness) par courant.
+    2. Affinage par section dorée autour du meilleur point du balayage,
+       jusqu'à un intervalle de `tolerance`.
+    3. Le courant retenu (meilleur score mesuré) est appliqué.
+
+    Le balayage est en pipeline : dès que l'image d'un point est lue, la
+    consigne suivante est envoyée, et l'image précédente est notée pendant
+    que la lentille se stabilise. Chaque image est demandée au thread vidéo
+    (VideoThread.request_frame) au moins `settle_time` après l'envoi effectif
+    de la consigne. Les courants sont arrondis au mA (résolution de
+    PowerSupply.set_current) et un courant déjà mesuré n'est pas remesuré.
+
+    À placer dans un QThread (moveToThread) puis lancer `run` ; la connexion
+    à l'alimentation est ouverte dans ce thread si besoin (l'interface ne
+    l'attend pas).
+
+    Attributs :
+        alim (PowerSupply) : Alimentation de l'objectif (connectée au lancement de `run`).
+        channel (int) : Canal de l'objectif.
+        video_thread (VideoThread) : Source des images.
+        scores (dict) : Score mesuré par courant (A).
+        last_current (float) : Dernière consigne envoyée (A), None avant la première.
+    """
+    progress = QtCore.pyqtSignal(float, float)  # courant (A), score
+    finished = QtCore.pyqtSignal(object)  # résultat (dict), ou None si interrompu / en erreur
+
+    def __init__(self, alim, channel, video_thread, current_min: float, current_max: float,
+                 n_coarse: int = 11, tolerance: float = 0.001, settle_time: float = 0.15,
+                 roi=None, downsample: int = 2):
+        """
+        :param alim: PowerSupply de l'objectif
+        :param channel: Canal de l'objectif
+        :param video_thread: VideoThread en cours d'exécution
+        :param current_min: Début du balayage (A)
+        :param current_max: Fin du balayage (A)
+        :param n_coarse: Nombre de points du balayage grossier
+        :param tolerance: Largeur (A) de l'intervalle final de la section dorée
+        :param settle_time: Délai (s) entre l'envoi d'une consigne et l'image notée
+        :param roi: Région (x, y, largeur, hauteur) notée ; None = image entière
+        :param downsample: Facteur de réduction avant le calcul du score
+        """
+        super().__init__()
+        self.alim = alim
+        self.channel = channel
+        self.video_thread = video_thread
+        self.current_min = current_min
+        self.current_max = current_max
+        self.n_coarse = max(3, n_coarse)
+        self.tolerance = max(tolerance, 0.001)
+        self.settle_time = settle_time
+        self.roi = roi
+        self.downsample = downsample
+        self.scores = {}
+        self.last_current = None
+        self._running = True
+
+    def stop(self):
+        """Demande l'arrêt de la mise au point (le courant reste au dernier point mesuré)."""
+        self._running = False
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            if self.alim.open_connection() is None:  # immédiat si la session est déjà ouverte
+                raise RuntimeError(f"alimentation {self.alim.address} non connectée")
+            best = self.coarse_sweep()
+            if best is not None:
+                best = self.refine(best)
+        except Exception as e:
+            print("Erreur lors de la mise au point :", e)
+            best = None
+        if best is None or not self._running:
+            self.finished.emit(None)
+            return
+        self.alim.set_current(best, channel=self.channel)
+        result = {
+            "current": best,
+            "score": self.scores[best],
+            "evaluations": len(self.scores),
+            "duration": time.monotonic() - start,
+        }
+        print(f"Mise au point : {best * 1000:.0f} mA (score {result['score']:.1f}, "
+              f"{result['evaluations']} images, {result['duration']:.1f} s)")
+        self.finished.emit(result)
+
+    def coarse_sweep(self):
+        """Balayage grossier en pipeline ; retourne le courant du meilleur score."""
+        currents = []
+        for current in np.linspace(self.current_min, self.current_max, self.n_coarse):
+            current = self.quantize(current)
+            if current not in currents:
+                currents.append(current)
+        pending = self.set_and_capture(currents[0])
+        for index, current in enumerate(currents):
+            frame, _ = pending.result(timeout=self.timeout())
+            if not self._running:
+                return None
+            if index + 1 < len(currents):
+                # La consigne suivante part avant la notation de l'image courante
+                pending = self.set_and_capture(currents[index + 1])
+            self.record(current, frame)
+        return max(self.scores, key=self.scores.get)
+
+    def refine(self, best):
+        """Section dorée sur l'intervalle encadrant `best` ; retourne le meilleur courant mesuré."""
+        step = (self.current_max - self.current_min) / (self.n_coarse - 1)
+        a = max(self.current_min, best - step)
+        b = min(self.current_max, best + step)
+        c = b - INV_PHI * (b - a)
+        d = a + INV_PHI * (b - a)
+        score_c, score_d = self.measure(c), self.measure(d)
+        while b - a > self.tolerance and self._running:
+            if score_c >= score_d:
+                b, d, score_d = d, c, score_c
+                c = b - INV_PHI * (b - a)
+                score_c = self.measure(c)
+            else:
+                a, c, score_c = c, d, score_d
+                d = a + INV_PHI * (b - a)
+                score_d = self.measure(d)
+        return max(self.scores, key=self.scores.get)
+
+    def measure(self, current):
+        """Score au courant `current` (arrondi au mA), mesuré seulement s'il ne l'a pas déjà été."""
+        current = self.quantize(current)
+        if current not in self.scores:
+            frame, _ = self.set_and_capture(current).result(timeout=self.timeout())
+            self.record(current, frame)
+        return self.scores[current]
+
+    def record(self, current, frame):
+        score = sharpness(frame, self.roi, self.downsample)
+        self.scores[current] = score
+        self.progress.emit(current, score)
+
+    def set_and_capture(self, current) -> Future:
+        """
+        Envoie la consigne puis demande une image lue au moins `settle_time` après son envoi.
+
+        :return: Future donnant (image, instant de lecture)
+        """
+        result = Future()
+
+        def forward(frame_future):
+            if frame_future.cancelled():
+                result.cancel()
+            elif frame_future.exception() is not None:
+                result.set_exception(frame_future.exception())
+            else:
+                result.set_result(frame_future.result())
+
+        def on_written(write_future=None):
+            if write_future is not None and write_future.exception() is not None:
+                result.set_exception(write_future.exception())
+                return
+            frame_future = self.video_thread.request_frame(time.time() + self.settle_time)
+            frame_future.add_done_callback(forward)
+
+        written = self.alim.set_current(current, channel=self.channel)
+        if written is None:
+            raise RuntimeError(f"consigne de {current * 1000:.0f} mA non envoyée")
+        self.last_current = current
+        written.add_done_callback(on_written)
+        return result
+
+    def quantize(self, current):
+        """Arrondit au mA, dans les bornes du balayage."""
+        return round(min(max(current, self.current_min), self.current_max), 3)
+
+    def timeout(self):
+        return self.settle_time + 4 * self.alim.timeout / 1000 + 2.0
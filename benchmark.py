@@ -0,0 +1,335 @@
+"""
+Banc de mesure de débit du scan, sans interface visible et sans matériel.
+
+Enchaîne ScanGenerator -> AcquisitionWorker (ou BufferedAcquisitionWorker)
+-> SEMImageLive contre les instruments simulés, pour une matrice de
+résolutions, d'échantillons par pixel, de motifs et de modes, et écrit les
+résultats en JSON.
+
+Chaque cas tourne dans un sous-processus (pic de RSS propre à chaque cas) et
+est arrêté au bout de `--time-budget` secondes : le débit mesuré sert alors à
+estimer la durée d'une image complète.
+
+Le démarrage de l'application (jusqu'au premier affichage de la fenêtre
+principale) est aussi mesuré, dans des interpréteurs neufs (`--cold-start-runs`).
+
+Exemple :
+    python benchmark.py --resolutions 64 256 --spp 1 4 --patterns raster serpentine
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import numpy as np
+
+# Pas d'affichage nécessaire
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+SCAN_ADDRESS = "ASRL5::INSTR"
+
+
+def run_case(resolution: int, samples_per_pixel: int, pattern: str, mode: str,
+             latency: float, sample_period: float, time_budget: float) -> dict:
+    """
+    Exécute un scan simulé et retourne ses mesures.
+
+    :param resolution: Pixels par ligne et par colonne
+    :param samples_per_pixel: Échantillons par pixel
+    :param pattern: Motif de ScanGenerator
+    :param mode: "serial" (consignes série) ou "buffered" (AO/AI cadencées)
+    :param latency: Latence simulée par écriture/lecture série (s)
+    :param sample_period: Durée simulée d'un échantillon détecteur (s)
+    :param time_budget: Durée maximale du scan (s)
+    :return: Dictionnaire de résultats
+    """
+    from PyQt6 import QtCore, QtWidgets
+    import pyqtgraph as pg
+    from scan import ScanGenerator
+    from power_supply import PowerSupply
+    from acq import NiDetectorAcquisition, NiBufferedScan
+    from image_viewer import SEMImageLive
+    from simulation import get_simulated_instrument, SimulatedDetectorTask
+    from instrumentation import Profiler
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+    instrument = get_simulated_instrument(SCAN_ADDRESS)
+    instrument.command_latency = latency
+    alim = PowerSupply(connection_mode="USB", address=SCAN_ADDRESS, Vmin=0, Vmax=12000,
+                       Imin=0.0, Imax=1000, name="GPP-2323 (sim)", backend="sim")
+    alim.open_connection()
+    acquisition = NiDetectorAcquisition(
+        channel_read="Dev2/ai1", backend="sim",
+        simulated_task=SimulatedDetectorTask(scan_address=SCAN_ADDRESS, sample_period=sample_period))
+    buffered = None
+    if mode == "buffered":
+        buffered = NiBufferedScan(backend="sim", sample_rate=1 / sample_period if sample_period > 0 else 1e9)
+
+    scan = ScanGenerator(current_range=(0, 0.1), resolution=resolution,
+                         samples_per_pixel=samples_per_pixel, pattern=pattern)
+    image_view = pg.ImageView()
+    viewer = SEMImageLive(scan=scan, alim=alim, channel_x=1, channel_y=2,
+                          acquisition=acquisition, image_view=image_view, buffered=buffered)
+
+    profiler = Profiler()
+    profiler.attach(alim, "set_currents")
+    profiler.attach(acquisition, "read_block")
+    profiler.attach(image_view.imageItem, "setImage", "redraw")
+
+    # Retard de la boucle d'événements : écart entre la période demandée et la période réelle
+    lag_interval = 0.010
+    lags = []
+    last_tick = [time.perf_counter()]
+
+    def on_tick():
+        now = time.perf_counter()
+        lags.append(max(0.0, now - last_tick[0] - lag_interval))
+        last_tick[0] = now
+
+    lag_timer = QtCore.QTimer()
+    lag_timer.setInterval(int(lag_interval * 1000))
+    lag_timer.timeout.connect(on_tick)
+
+    # Compteurs série relevés à la fin du scan, avant la remise à zéro des sorties
+    # (arrêt sur budget ou on_finished) : seules les commandes du scan sont comptées
+    scan_end = {}
+
+    def snapshot_scan_end():
+        if scan_end:
+            return
+        try:
+            alim.io.submit(lambda instr: None).result(timeout=5.0)  # consignes déjà en file envoyées
+        except Exception as e:
+            print("Erreur lors du relevé des compteurs série :", e)
+        scan_end["time"] = time.perf_counter()
+        scan_end["counters"] = dict(instrument.counters)
+
+    def stop_on_budget():
+        snapshot_scan_end()
+        viewer.stop()
+
+    on_finished = viewer.on_finished
+
+    def finish():
+        snapshot_scan_end()
+        on_finished()
+
+    viewer.on_finished = finish  # connecté par viewer.start()
+    viewer.scan_completed.connect(app.quit)
+    QtCore.QTimer.singleShot(int(time_budget * 1000), stop_on_budget)
+
+    counters_before = dict(instrument.counters)
+    start = time.perf_counter()
+    viewer.start()
+    lag_timer.start()
+    last_tick[0] = time.perf_counter()
+    app.exec()
+    elapsed = time.perf_counter() - start
+    lag_timer.stop()
+    # scan_completed part avant que le QThread du worker n'ait fini de s'arrêter : on
+    # continue de traiter les événements (quit et deleteLater sont en file d'attente)
+    deadline = time.monotonic() + 5.0
+    try:
+        while viewer.thread is not None and viewer.thread.isRunning() and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+    except RuntimeError:
+        pass  # QThread déjà détruit (deleteLater)
+
+    total_pixels = resolution * resolution
+    pixels = viewer.levels.count
+    snapshot_scan_end()
+    scan_elapsed = scan_end["time"] - start
+    commands = scan_end["counters"]["commands"] - counters_before["commands"]
+    writes = scan_end["counters"]["writes"] - counters_before["writes"]
+    pixels_per_s = pixels / elapsed if elapsed > 0 else 0.0
+    lags_ms = np.asarray(lags) * 1000 if lags else np.zeros(1)
+
+    return {
+        "resolution": resolution,
+        "samples_per_pixel": samples_per_pixel,
+        "pattern": pattern,
+        "mode": mode,
+        "serial_latency_s": latency,
+        "serial_parse_time_s": instrument.parse_time,
+        "serial_baud_rate": instrument.baud_rate,
+        "sample_period_s": sample_period,
+        "completed": pixels >= total_pixels,
+        "elapsed_s": elapsed,
+        "pixels": pixels,
+        "pixels_per_s": pixels_per_s,
+        "estimated_frame_s": total_pixels / pixels_per_s if pixels_per_s > 0 else None,
+        "serial_commands": commands,
+        "serial_commands_per_s": commands / scan_elapsed if scan_elapsed > 0 else 0.0,
+        "serial_writes_per_s": writes / scan_elapsed if scan_elapsed > 0 else 0.0,
+        "stages": profiler.snapshot(),
+        "event_loop_lag_ms": {
+            "p50": float(np.percentile(lags_ms, 50)),
+            "p95": float(np.percentile(lags_ms, 95)),
+            "max": float(lags_ms.max()),
+        },
+        # ru_maxrss est en ko sous Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_cold_start(spawn_time: float) -> dict:
+    """
+    Mesure le démarrage de l'application dans un interpréteur neuf.
+
+    :param spawn_time: Instant (time.time()) du lancement du processus par le parent
+    :return: Durées jusqu'au premier affichage de MainWindow, du préchargement des
+             fenêtres, et du chargement des .ui (première fois puis depuis le cache)
+    """
+    start = time.perf_counter()
+    from PyQt6 import QtWidgets
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    import main_window
+    imported = time.perf_counter()
+    window = main_window.MainWindow()
+    window.show()
+    app.processEvents()
+    first_paint = time.time() - spawn_time
+    painted = time.perf_counter()
+
+    # Ce que coûtaient les imports faits autrefois au chargement de main_window
+    main_window.warm_up_modules()
+    warmed = time.perf_counter()
+
+    from ui_cache import load_ui
+    ui_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interface")
+    ui_load_ms = {}
+    for name in ("scan.ui", "power_supply.ui", "multi_power_supply.ui", "camera.ui"):
+        timings = []
+        for _ in range(2):
+            widget = QtWidgets.QWidget()
+            t0 = time.perf_counter()
+            try:
+                load_ui(os.path.join(ui_dir, name), widget)
+            except Exception as e:
+                timings = None
+                print(f"{name} :", e)
+                break
+            timings.append((time.perf_counter() - t0) * 1000)
+            widget.deleteLater()
+        if timings:
+            ui_load_ms[name] = {"first": timings[0], "cached": timings[1]}
+
+    return {
+        "process_to_first_paint_s": first_paint,
+        "main_window_import_s": imported - start,
+        "main_window_show_s": painted - imported,
+        "deferred_window_imports_s": warmed - painted,
+        "ui_load_ms": ui_load_ms,
+    }
+
+
+def run_subprocess(arguments) -> dict:
+    """Lance ce script dans un interpréteur séparé et relit la dernière ligne JSON de sa sortie."""
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__)] + arguments,
+                               capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    # Le résultat est la dernière ligne de la sortie (les modules affichent aussi des messages)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"error": completed.stderr.strip()[-2000:] or "aucun résultat"}
+
+
+def run_case_subprocess(case: dict, args) -> dict:
+    """Lance un cas dans un interpréteur séparé et relit son résultat JSON."""
+    result = run_subprocess([
+        "--single",
+        "--resolutions", str(case["resolution"]),
+        "--spp", str(case["samples_per_pixel"]),
+        "--patterns", case["pattern"],
+        "--modes", case["mode"],
+        "--latency", str(args.latency),
+        "--sample-period", str(args.sample_period),
+        "--time-budget", str(args.time_budget),
+    ])
+    return dict(case, **result) if "error" in result else result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure du débit de scan (instruments simulés)")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[64, 128, 256, 512, 1024, 2048])
+    parser.add_argument("--spp", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--patterns", nargs="+", default=["raster", "serpentine", "progressive"])
+    parser.add_argument("--modes", nargs="+", default=["serial", "buffered"], choices=["serial", "buffered"])
+    parser.add_argument("--latency", type=float, default=0.002, help="latence série simulée par écriture/lecture (s), hors transmission et décodage")
+    parser.add_argument("--sample-period", type=float, default=1e-5, help="durée d'un échantillon (s)")
+    parser.add_argument("--time-budget", type=float, default=10.0, help="durée maximale par cas (s)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--cold-start-runs", type=int, default=3,
+                        help="nombre de mesures du démarrage de l'application (0 = aucune)")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--cold-start-single", type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Force les instruments simulés, y compris dans les sous-processus
+    os.environ["OPC_BACKEND"] = "sim"
+
+    cases = [
+        {"resolution": resolution, "samples_per_pixel": spp, "pattern": pattern, "mode": mode}
+        for mode in args.modes
+        for pattern in args.patterns
+        for resolution in args.resolutions
+        for spp in args.spp
+    ]
+
+    if args.cold_start_single is not None:
+        print(json.dumps(run_cold_start(args.cold_start_single)), flush=True)
+        return
+
+    if args.single:
+        case = cases[0]
+        result = run_case(case["resolution"], case["samples_per_pixel"], case["pattern"], case["mode"],
+                          args.latency, args.sample_period, args.time_budget)
+        print(json.dumps(result), flush=True)
+        return
+
+    cold_starts = []
+    for _ in range(args.cold_start_runs):
+        cold_start = run_subprocess(["--cold-start-single", repr(time.time())])
+        cold_starts.append(cold_start)
+        if "error" in cold_start:
+            print(f"Démarrage : ERREUR {cold_start['error']}")
+        else:
+            print(f"Démarrage : premier affichage {cold_start['process_to_first_paint_s']:.2f} s, "
+                  f"fenêtres préchargées ensuite en {cold_start['deferred_window_imports_s']:.2f} s")
+
+    results = []
+    for case in cases:
+        result = run_case_subprocess(case, args)
+        results.append(result)
+        if "error" in result:
+            print(f"{case} : ERREUR {result['error']}")
+        else:
+            print(f"{case['mode']:>8} {case['pattern']:>11} {case['resolution']:>5}px "
+                  f"x{case['samples_per_pixel']:<3} {result['pixels_per_s']:>12.0f} px/s "
+                  f"{result['serial_commands_per_s']:>8.0f} cmd/s  RSS {result['peak_rss_mb']:.0f} Mo")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "serial_latency_s": args.latency,
+            "sample_period_s": args.sample_period,
+            "time_budget_s": args.time_budget,
+        },
+        "cold_start": cold_starts,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 from PyQt6.QtWidgets import QApplication, QWidget
-from PyQt6 import uic
+from ui_cache import load_ui
 import pyqtgraph as pg
 from collections import defaultdict
 import time
 import sys
 import os
 import random
+from ring_buffer import RingBuffer
 from multi_power_supply_stand_alone import MultiPowerSupplyWidget
 from PyQt6.QtCore import QThread, pyqtSignal, pyqtSlot
 
@@ -16,16 +17,32 @@ if not os.path.exists(ui_file):
     raise FileNotFoundError(f"UI introuvable : {ui_file}")
 
 class CalculationsWidget(QWidget):
-    def __init__(self, multi_power_supply=None, parent=None):
+    """
+    Tracé de la tension et du courant de chaque lentille au fil du temps.
+
+    L'historique de chaque lentille et grandeur est un RingBuffer de
+    `history` points : ajout en O(1), mémoire fixe, et courbes mises à jour
+    avec une vue ordonnée du tampon, sans copie ni conversion de listes.
+    """
+    def __init__(self, multi_power_supply=None, parent=None, history=500):
+        """
+        :param multi_power_supply: MultiPowerSupplyWidget dont les relevés sont tracés (optionnel)
+        :param parent: Widget parent
+        :param history: Nombre de points conservés par lentille et par grandeur
+        """
         super().__init__(parent)
-        uic.loadUi(ui_file, self)
+        load_ui(ui_file, self)
         
         # Initialisation
-        self.data = defaultdict(lambda: {'time': [], 'voltage': [], 'current': []})
+        self.history = history
+        self.data = defaultdict(lambda: {key: RingBuffer(self.history) for key in ('time', 'voltage', 'current')})
         self.start_time = time.time()
         
         # Configuration minimale du graphique
         self.plot_widget.clear()
+        # Longs historiques : seuls les points visibles sont tracés, sous-échantillonnés à l'écran
+        self.plot_widget.setClipToView(True)
+        self.plot_widget.setDownsampling(auto=True, mode='peak')
         self.plot_widget.setLabel('left', 'Tension (V)')
         self.plot_widget.setLabel('bottom', 'Temps (s)')
         self.plot_widget.addLegend()
@@ -57,9 +74,11 @@ class CalculationsWidget(QWidget):
 
     def update_plot(self, all_data):
         """Met à jour le graphique avec les nouvelles données"""
-        current_time = time.time() - self.start_time
+        now = time.time()
         
         for lens, values in all_data.items():
+            # Horodatage de la mesure si disponible (relevé de fond), sinon l'instant de réception
+            current_time = values.get('timestamp', now) - self.start_time
             # Conversion des valeurs
             try:
                 v = float(values['voltage'].rstrip('V'))
@@ -67,16 +86,11 @@ class CalculationsWidget(QWidget):
             except ValueError:
                 continue
                 
-            # Stockage des données
+            # Stockage des données (les points au-delà de `history` écrasent les plus anciens)
             self.data[lens]['time'].append(current_time)
             self.data[lens]['voltage'].append(v)
             self.data[lens]['current'].append(i)
             
-            # Limite à 500 points max
-            if len(self.data[lens]['time']) > 500:
-                for key in ['time', 'voltage', 'current']:
-                    self.data[lens][key] = self.data[lens][key][-500:]
-            
             # Crée les courbes si elles n'existent pas
             if lens not in self.curves:
                 # Couleur basée sur l'index modulo le nombre de couleurs disponibles
@@ -103,9 +117,10 @@ class CalculationsWidget(QWidget):
             # Lancement du calcul en arrière-plan
             #self.launch_calculation(lens, v, i, current_time)
 
-            # # Mise à jour des courbes
-            self.curves[lens]['voltage'].setData(self.data[lens]['time'], self.data[lens]['voltage'])
-            self.curves[lens]['current'].setData(self.data[lens]['time'], self.data[lens]['current'])
+            # # Mise à jour des courbes (vues ordonnées des tampons, sans copie)
+            times = self.data[lens]['time'].view()
+            self.curves[lens]['voltage'].setData(times, self.data[lens]['voltage'].view())
+            self.curves[lens]['current'].setData(times, self.data[lens]['current'].view())
             # Mise à jour de toutes les courbes
             #self.update_all_curves()
 
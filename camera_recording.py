@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import queue
+import threading
+import numpy as np
+import cv2
+
+RECORD_FORMATS = ("video", "raw")
+
+
+class FrameRecorder:
+    """
+    Enregistre des images de la caméra sur disque depuis un thread d'écriture dédié.
+
+    Le thread de capture appelle `submit` pour chaque image : l'image est
+    copiée dans un emplacement libre d'un pool préalloué (`queue_size`
+    emplacements) puis mise dans une file bornée. `submit` ne bloque jamais :
+    si l'écriture a pris du retard et qu'aucun emplacement n'est libre,
+    l'image est perdue et comptée dans `dropped`.
+
+    Formats :
+        "video" : fichier `frames.avi` (cv2.VideoWriter, codec `codec`).
+        "raw" : fichier `frames.u8` (images BGR brutes les unes après les autres),
+                relu sans copie par load_raw_frames (np.memmap).
+
+    Dans les deux cas, `metadata.json` décrit l'enregistrement (format, taille
+    des images, images écrites et perdues) et `timestamps.npy` contient
+    l'horodatage (time.time()) de chaque image écrite.
+
+    Attributs :
+        directory (str) : Dossier de l'enregistrement.
+        written (int) : Nombre d'images écrites.
+        dropped (int) : Nombre d'images perdues (pool plein ou erreur d'écriture).
+
+    Les compteurs sont mis à jour par le thread de capture et par le thread
+    d'écriture, et lus par l'interface : ils sont protégés par un verrou. Un
+    second verrou ordonne `submit` et `stop` : aucune image n'est mise en file
+    après la fin d'enregistrement sans être comptée comme perdue.
+
+    Si le fichier ne peut pas être ouvert, `failed` passe à True : les images
+    en file et les suivantes sont comptées comme perdues, et les métadonnées
+    sont tout de même écrites.
+    """
+    def __init__(self, directory: str, record_format: str = "video", fps: float = 30.0,
+                 queue_size: int = 16, codec: str = "MJPG"):
+        """
+        Args:
+            directory (str): Dossier de l'enregistrement (créé si besoin).
+            record_format (str): "video" ou "raw".
+            fps (float): Cadence déclarée du fichier vidéo.
+            queue_size (int): Nombre d'images pouvant attendre l'écriture.
+            codec (str): Code FourCC du codec vidéo.
+        """
+        if record_format not in RECORD_FORMATS:
+            raise ValueError(f"Format inconnu : {record_format} (attendu : {', '.join(RECORD_FORMATS)})")
+        self.directory = directory
+        self.record_format = record_format
+        self.fps = fps
+        self.queue_size = queue_size
+        self.codec = codec
+        self._written = 0
+        self._dropped = 0
+        self._counts_lock = threading.Lock()
+        self.frame_shape = None
+        self.timestamps = []
+        self._slots = None
+        self._free = queue.Queue()
+        self._pending = queue.Queue(maxsize=queue_size + 1)  # + 1 pour la fin d'enregistrement
+        self._thread = None
+        self._stopped = False
+        self._failed = False
+        self._state_lock = threading.Lock()  # ordonne submit / stop / échec d'ouverture
+        self.start_time = time.time()
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, frame: np.ndarray, timestamp: float = None) -> bool:
+        """
+        Confie une image à l'écriture (appelée depuis le thread de capture, ne bloque pas).
+
+        Args:
+            frame (np.ndarray): Image BGR (h, w, 3), copiée avant le retour.
+            timestamp (float): Instant de capture (time.time()) ; par défaut maintenant.
+
+        Returns:
+            bool: False si l'image a été perdue.
+        """
+        if self._stopped:
+            return False
+        if self._failed:
+            self._count_dropped()
+            return False
+        if self._slots is None:
+            with self._state_lock:
+                if self._stopped:
+                    return False
+                self._open(frame.shape, frame.dtype)
+        elif frame.shape != self.frame_shape:
+            self._count_dropped()
+            return False
+        try:
+            index = self._free.get_nowait()
+        except queue.Empty:
+            self._count_dropped()
+            return False
+        np.copyto(self._slots[index], frame)
+        with self._state_lock:
+            # Vérifié sous verrou : jamais de mise en file après la fin d'enregistrement
+            if not (self._stopped or self._failed):
+                self._pending.put_nowait((index, time.time() if timestamp is None else timestamp))
+                return True
+        self._free.put(index)
+        self._count_dropped()
+        return False
+
+    def stop(self, wait: bool = True):
+        """
+        Termine l'enregistrement : les images en file sont écrites, puis le fichier est fermé.
+
+        Args:
+            wait (bool): Attend la fin de l'écriture (False depuis le thread de capture).
+        """
+        with self._state_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+            if thread is not None and not self._failed:
+                self._pending.put(None)  # après la dernière image mise en file
+        if thread is None:
+            self._write_metadata()
+            return
+        if self._failed:
+            # Le thread d'écriture s'est arrêté à l'échec : métadonnées avec les pertes depuis
+            thread.join()
+            self._write_metadata()
+        elif wait:
+            thread.join()
+
+    @property
+    def written(self) -> int:
+        with self._counts_lock:
+            return self._written
+
+    @property
+    def dropped(self) -> int:
+        with self._counts_lock:
+            return self._dropped
+
+    def _count_dropped(self):
+        with self._counts_lock:
+            self._dropped += 1
+
+    @property
+    def recording(self) -> bool:
+        return not self._stopped
+
+    @property
+    def failed(self) -> bool:
+        """True si le fichier d'enregistrement n'a pas pu être ouvert."""
+        return self._failed
+
+    @property
+    def done(self) -> bool:
+        """True une fois l'enregistrement arrêté et toutes les images écrites."""
+        return self._stopped and (self._thread is None or not self._thread.is_alive())
+
+    def _open(self, shape, dtype):
+        """Alloue le pool d'emplacements et lance le thread d'écriture (première image)."""
+        self.frame_shape = shape
+        self._slots = np.empty((self.queue_size,) + tuple(shape), dtype=dtype)
+        for index in range(self.queue_size):
+            self._free.put(index)
+        self._thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        height, width = self.frame_shape[:2]
+        writer = raw_file = None
+        try:
+            if self.record_format == "video":
+                writer = cv2.VideoWriter(os.path.join(self.directory, "frames.avi"),
+                                         cv2.VideoWriter_fourcc(*self.codec), self.fps, (width, height))
+                if not writer.isOpened():
+                    raise RuntimeError("impossible d'ouvrir le fichier vidéo")
+            else:
+                # Gros buffer d'écriture : un appel système pour plusieurs images
+                raw_file = open(os.path.join(self.directory, "frames.u8"), "ab", buffering=1 << 22)
+        except Exception as e:
+            print("Erreur à l'ouverture de l'enregistrement :", e)
+            if writer is not None:
+                writer.release()
+            with self._state_lock:
+                self._failed = True  # plus aucune image n'est mise en file
+            # Les images déjà en file sont perdues
+            while True:
+                try:
+                    job = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    self._count_dropped()
+                    self._free.put(job[0])
+            self._write_metadata()
+            return
+
+        while True:
+            job = self._pending.get()
+            if job is None:
+                break
+            index, timestamp = job
+            try:
+                if writer is not None:
+                    writer.write(self._slots[index])
+                else:
+                    raw_file.write(memoryview(self._slots[index]))
+                with self._counts_lock:
+                    self._written += 1
+                self.timestamps.append(timestamp)
+            except Exception as e:
+                self._count_dropped()
+                print("Erreur lors de l'écriture d'une image :", e)
+            finally:
+                self._free.put(index)
+
+        if writer is not None:
+            writer.release()
+        if raw_file is not None:
+            raw_file.close()
+        self._write_metadata()
+
+    def _write_metadata(self):
+        """Écrit les horodatages et `metadata.json` (fichier temporaire puis remplacement)."""
+        with self._counts_lock:
+            written, dropped = self._written, self._dropped
+        np.save(os.path.join(self.directory, "timestamps.npy"), np.asarray(self.timestamps, dtype=np.float64))
+        metadata = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start_time)),
+            "format": self.record_format,
+            "file": "frames.avi" if self.record_format == "video" else "frames.u8",
+            "codec": self.codec if self.record_format == "video" else None,
+            "fps": self.fps,
+            "frame_shape": list(self.frame_shape) if self.frame_shape else None,
+            "dtype": "uint8",
+            "channel_order": "BGR",
+            "frames_written": written,
+            "frames_dropped": dropped,
+            "error": "ouverture du fichier impossible" if self._failed else None,
+        }
+        path = os.path.join(self.directory, "metadata.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(metadata, f, indent=4)
+        os.replace(path + ".tmp", path)
+
+
+def load_raw_frames(directory: str):
+    """
+    Relit un enregistrement au format "raw" sans le charger en mémoire.
+
+    Args:
+        directory (str): Dossier de l'enregistrement.
+
+    Returns:
+        Tuple[np.memmap, np.ndarray, dict]: Images (n, h, w, 3) BGR en lecture
+        seule, horodatages (s) et métadonnées.
+    """
+    with open(os.path.join(directory, "metadata.json"), "r") as f:
+        metadata = json.load(f)
+    if metadata["format"] != "raw":
+        raise ValueError(f"{directory} : enregistrement au format {metadata['format']}, pas raw")
+    shape = tuple(metadata["frame_shape"])
+    frames = np.memmap(os.path.join(directory, metadata["file"]), dtype=metadata["dtype"], mode="r")
+    n_frames = frames.size // int(np.prod(shape))
+    frames = frames[:n_frames * int(np.prod(shape))].reshape((n_frames,) + shape)
+    timestamps = np.load(os.path.join(directory, "timestamps.npy"))
+    return frames, timestamps, metadata
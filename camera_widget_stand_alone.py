@@ -1,28 +1,86 @@
 import sys
 import os
-from PyQt6 import QtWidgets, uic
+import json
+import time
+import threading
+from concurrent.futures import Future
+import numpy as np
+from PyQt6 import QtWidgets
+from ui_cache import load_ui
 from PyQt6.QtCore import QThread, pyqtSignal, QTimer, Qt, QRect
 from PyQt6.QtWidgets import QApplication, QWidget, QButtonGroup
 from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import QFileDialog
 import cv2
+from camera_recording import FrameRecorder
+from autofocus import AutofocusWorker
+from power_supply import PowerSupply
 
 # Charger dynamiquement le fichier .ui
 dossier_courant = os.path.dirname(os.path.abspath(__file__))
 qtCreatorFile = os.path.join(dossier_courant, "interface", "camera.ui")
 
 
+def render_view(frame, zoom, position, out):
+    """
+    Rééchantillonne la partie visible d'une image dans une vue de taille fixe.
+
+    Équivaut à agrandir toute l'image d'un facteur `zoom` puis à y découper
+    la vue en `position`, mais seule la région source visible est lue et
+    rééchantillonnée (une transformation affine vers la vue) : le coût dépend
+    de la taille de la vue, pas du zoom. Les zones de la vue hors de l'image
+    sont noires.
+
+    Args:
+        frame (np.ndarray): Image source (h, w, 3).
+        zoom (float): Facteur d'agrandissement.
+        position (Tuple[int, int]): Coin haut-gauche de la vue, en pixels de l'image agrandie.
+        out (np.ndarray): Vue (hauteur, largeur, 3), remplie en place.
+
+    Returns:
+        np.ndarray: `out`.
+    """
+    view_h, view_w = out.shape[:2]
+    frame_h, frame_w = frame.shape[:2]
+    # Région source visible (+1 pixel de marge pour l'interpolation)
+    x0, y0 = position[0] / zoom, position[1] / zoom
+    sx0, sy0 = max(0, int(np.floor(x0)) - 1), max(0, int(np.floor(y0)) - 1)
+    sx1 = min(frame_w, int(np.ceil(x0 + view_w / zoom)) + 1)
+    sy1 = min(frame_h, int(np.ceil(y0 + view_h / zoom)) + 1)
+    if sx1 <= sx0 or sy1 <= sy0:
+        out[...] = 0
+        return out
+    # Transformation région source -> vue (centres de pixels alignés comme un agrandissement
+    # de toute l'image) ; warpAffine ne calcule que les pixels de la vue, hors image = noir
+    offset = 0.5 * (zoom - 1)
+    matrix = np.array([[zoom, 0.0, zoom * sx0 + offset - position[0]],
+                       [0.0, zoom, zoom * sy0 + offset - position[1]]])
+    interpolation = cv2.INTER_LINEAR if zoom >= 1 else cv2.INTER_NEAREST
+    cv2.warpAffine(frame[sy0:sy1, sx0:sx1], matrix, (view_w, view_h), dst=out,
+                   flags=interpolation, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    return out
+
+
 class CameraWidget(QWidget):
     """
     Widget PyQt6 pour afficher un flux vidéo de la webcam, avec possibilité de zoom,
-    de déplacement dans l'image, et de capture manuelle.
+    de déplacement dans l'image, de capture manuelle et d'enregistrement.
 
     Gère un thread séparé (VideoThread) pour capturer les images en continu
-    sans bloquer l'interface graphique.
+    sans bloquer l'interface graphique. L'enregistrement (continu, ou d'un
+    nombre fixé d'images au déclenchement) est écrit dans
+    "recordings/<date>_<heure>" par un FrameRecorder.
+
+    Le bouton Autofocus lance un AutofocusWorker sur le courant de la lentille
+    "Objective" (power_supplies_params.json), noté sur la région visible. Le
+    courant laissé par la mise au point est publié par `lensCurrentChanged`
+    (la fenêtre des alimentations met alors son slider à jour).
     """
+    lensCurrentChanged = pyqtSignal(str, float)  # lentille, courant (A) réglé depuis cette fenêtre
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        uic.loadUi(qtCreatorFile, self)  # Charger l'UI
+        load_ui(qtCreatorFile, self)  # Charger l'UI
 
         # Initialisation de la vue et du zoom
         self.zoom_level = 1.0
@@ -44,33 +102,51 @@ class CameraWidget(QWidget):
         #self.label_camera.setFocus()  # Donner le focus au label ###########
          # Créer et démarrer le thread de capture vidéo
         # Création et démarrage du thread vidéo
-        self.video_thread = VideoThread()
+        self.video_thread = VideoThread(view_size=self.view_size)
+        self.video_thread.set_view(self.zoom_level, self.view_position)
         self.video_thread.change_pixmap_signal.connect(self.update_image)
         self.video_thread.start()
 
         # Connexion du bouton de capture à la méthode dédiée
         self.pushButton_capture.clicked.connect(self.capture_image)
 
+        # Enregistrement
+        self.recorder = None
+        self.last_recorder = None  # affiché jusqu'à la fin de l'écriture
+        self.pushButton_record.toggled.connect(self.toggle_recording)
+        self.pushButton_trigger.clicked.connect(self.trigger_recording)
+        self.video_thread.recording_finished.connect(self.handle_recording_finished)
+        self.record_timer = QTimer(self)
+        self.record_timer.timeout.connect(self.update_record_status)
+
+        # Mise au point automatique (alimentation de l'objectif ouverte au premier lancement)
+        self.objective = None
+        self.objective_channel = 1
+        self.autofocus_thread = None
+        self.autofocus_worker = None
+        self.objective_params = self.load_objective_params()
+        if self.objective_params is not None:
+            self.doubleSpinBox_focus_min.setValue(self.objective_params["Imin"])
+            self.doubleSpinBox_focus_max.setValue(self.objective_params["Imax"])
+        else:
+            self.pushButton_autofocus.setEnabled(False)
+        self.pushButton_autofocus.clicked.connect(self.toggle_autofocus)
+
 
     def update_image(self, q_img):
         """
         Met à jour l'affichage avec une nouvelle image issue du thread caméra.
 
+        Le zoom et le déplacement sont déjà appliqués par le thread : l'image
+        reçue a exactement la taille de la vue.
+
         Args:
-            q_img (QImage): Image capturée, transmise par signal depuis VideoThread.
+            q_img (QImage): Vue capturée, transmise par signal depuis VideoThread.
         """
-        # Calculer la zone visible de l'image en fonction du zoom
-        zoomed_width = int(q_img.width() * self.zoom_level)
-        zoomed_height = int(q_img.height() * self.zoom_level)
-        zoomed_img = q_img.scaled(zoomed_width, zoomed_height, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation)  # Optimisation ###########
-
-        # Calculer la zone visible de l'image zoomée
-        view_rect = QRect(self.view_position[0], self.view_position[1], self.view_size[0], self.view_size[1])
-        visible_img = zoomed_img.copy(view_rect)
-
         # Mettre à jour l'image dans le QLabel
-        self.label_camera.setPixmap(QPixmap.fromImage(visible_img))
-        self.label_camera.setFixedSize(self.view_size[0], self.view_size[1])  # Taille fixe
+        self.label_camera.setPixmap(QPixmap.fromImage(q_img))
+        # Image affichée : le thread peut envoyer la suivante
+        self.video_thread.frame_consumed()
 
 
     def keyPressEvent(self, event):
@@ -92,34 +168,178 @@ class CameraWidget(QWidget):
         elif event.key() == Qt.Key.Key_Down:
             self.view_position[1] += 10  # Déplacer vers le bas
 
-        # Mettre à jour l'image avec le nouveau niveau de zoom et la position de la vue
-        self.update_image(self.video_thread.current_frame)
+        # Le thread applique le nouveau niveau de zoom et la position de la vue dès l'image suivante
+        self.video_thread.set_view(self.zoom_level, self.view_position)
 
     def capture_image(self):
         """
         Capture l'image actuellement affichée et propose de la sauvegarder.
 
-        Les signaux du thread sont temporairement bloqués pour éviter d’écraser
-        l’image pendant l’ouverture de la boîte de dialogue.
+        L'image est copiée avant l'ouverture de la boîte de dialogue : l'affichage
+        (et un éventuel enregistrement) continue pendant le choix du fichier.
         """
         pixmap = self.label_camera.pixmap()
-        if pixmap and not pixmap.isNull():  # Vérifier que le QLabel contient bien une image
-            # Bloquer temporairement les signaux du thread pour éviter qu'il ne mette à jour le label pendant la capture ### 
-            self.video_thread.blockSignals(True)
-           # Ouvrir une boîte de dialogue pour choisir l'emplacement de sauvegarde
-            file_path, _ = QFileDialog.getSaveFileName(self, "Sauvegarder l'image", 
+        if not pixmap or pixmap.isNull():  # Vérifier que le QLabel contient bien une image
+            print("Aucune image disponible pour la capture.")
+            return
+        image = pixmap.toImage().copy()  # copie détachée des tampons du thread vidéo
+        # Ouvrir une boîte de dialogue pour choisir l'emplacement de sauvegarde
+        file_path, _ = QFileDialog.getSaveFileName(self, "Sauvegarder l'image",
                                                    os.path.join(dossier_courant, "capture.png"),
-                                                   "Images (*.png *.jpg *.bmp)") 
-             # Réactiver les signaux du thread après la fermeture de la boîte de dialogue ### 
-            self.video_thread.blockSignals(False)                                    
+                                                   "Images (*.png *.jpg *.bmp)")
         if file_path:  # Vérifier si l'utilisateur a validé la sauvegarde
-            pixmap.save(file_path)  ###
-            print(f"Image capturée et enregistrée sous {file_path}") 
+            image.save(file_path)
+            print(f"Image capturée et enregistrée sous {file_path}")
+
+    def new_recorder(self):
+        """Crée l'enregistreur dans "recordings/<date>_<heure>" au format choisi."""
+        directory = os.path.join(dossier_courant, "recordings", time.strftime("%Y%m%d_%H%M%S"))
+        self.recorder = FrameRecorder(directory, record_format=self.comboBox_record_format.currentText())
+        self.last_recorder = self.recorder
+        print(f"Enregistrement de la caméra dans {directory}")
+        return self.recorder
+
+    def toggle_recording(self, checked):
+        """Démarre ou arrête l'enregistrement continu (bouton Record)."""
+        if checked:
+            if self.recorder is not None:
+                return
+            try:
+                self.video_thread.start_recording(self.new_recorder())
+            except Exception as e:
+                print("Erreur au démarrage de l'enregistrement :", e)
+                self.recorder = None
+                self.pushButton_record.setChecked(False)
+                return
+            self.set_recording_controls(True)
+        elif self.recorder is not None:
+            self.video_thread.stop_recording()
+            self.handle_recording_finished(self.recorder)
+
+    def trigger_recording(self):
+        """Enregistre les `spinBox_trigger_frames` prochaines images (bouton Trigger)."""
+        if self.recorder is not None:
+            return
+        try:
+            self.video_thread.start_recording(self.new_recorder(), self.spinBox_trigger_frames.value())
+        except Exception as e:
+            print("Erreur au démarrage de l'enregistrement :", e)
+            self.recorder = None
+            return
+        self.set_recording_controls(True)
+
+    def handle_recording_finished(self, recorder):
+        """Termine l'enregistrement (arrêt manuel ou fin d'un déclenchement)."""
+        if recorder is not self.recorder:
+            return
+        # Les images encore en file sont écrites en tâche de fond
+        recorder.stop(wait=False)
+        self.recorder = None
+        self.set_recording_controls(False)
+
+    def set_recording_controls(self, recording):
+        self.pushButton_record.blockSignals(True)
+        self.pushButton_record.setChecked(recording)
+        self.pushButton_record.blockSignals(False)
+        self.pushButton_trigger.setEnabled(not recording)
+        self.spinBox_trigger_frames.setEnabled(not recording)
+        self.comboBox_record_format.setEnabled(not recording)
+        self.record_timer.start(500)
+        self.update_record_status()
+
+    def update_record_status(self):
+        """Affiche le nombre d'images enregistrées et perdues, jusqu'à la fin de l'écriture."""
+        recorder = self.last_recorder
+        if recorder is None:
+            return
+        if recorder.done:
+            self.record_timer.stop()
+        if recorder.failed:
+            state = "Recording failed"
         else:
-            print("Aucune image disponible pour la capture.")  
+            state = "Recording" if recorder.recording else ("Saved" if recorder.done else "Saving")
+        self.label_record.setText(f"{state} : {recorder.written} frames written, "
+                                  f"{recorder.dropped} dropped ({os.path.basename(recorder.directory)})")
 
    
   
+    def load_objective_params(self, filename='power_supplies_params.json', lens='Objective'):
+        """
+        Retourne l'entrée de `lens` du fichier des alimentations, avec son canal
+        (attribué dans l'ordre du fichier pour une même adresse, comme dans
+        MultiPowerSupplyWidget), ou None si elle est absente.
+        """
+        try:
+            with open(os.path.join(dossier_courant, filename), 'r') as f:
+                params = json.load(f)
+        except Exception as e:
+            print("Erreur lors du chargement des paramètres des alimentations :", e)
+            return None
+        channels = {}
+        for entry in params:
+            channel = channels[entry["Adress"]] = channels.get(entry["Adress"], 0) + 1
+            if entry["Lens"] == lens:
+                return dict(entry, Channel=channel)
+        print(f"Lentille {lens} absente de {filename}")
+        return None
+
+    def visible_roi(self):
+        """Région de l'image pleine résolution actuellement affichée : (x, y, largeur, hauteur)."""
+        zoom = self.zoom_level
+        return (int(self.view_position[0] / zoom), int(self.view_position[1] / zoom),
+                max(1, int(self.view_size[0] / zoom)), max(1, int(self.view_size[1] / zoom)))
+
+    def toggle_autofocus(self):
+        """Lance la mise au point, ou l'interrompt si elle est en cours."""
+        if self.autofocus_worker is not None:
+            self.autofocus_worker.stop()
+            return
+        if self.autofocus_thread is not None:  # thread précédent en cours d'arrêt
+            return
+        if self.objective is None:
+            params = self.objective_params
+            self.objective = PowerSupply(connection_mode="USB", address=params["Adress"],
+                                         Imin=params["Imin"], Imax=params["Imax"],
+                                         Vmin=params["Vmin"], Vmax=params["Vmax"])
+            self.objective_channel = params["Channel"]
+        current_min = self.doubleSpinBox_focus_min.value() / 1000
+        current_max = self.doubleSpinBox_focus_max.value() / 1000
+        if current_max <= current_min:
+            self.label_autofocus.setText("Invalid current range")
+            return
+
+        self.autofocus_thread = QThread()
+        self.autofocus_worker = AutofocusWorker(self.objective, self.objective_channel, self.video_thread,
+                                                current_min, current_max, roi=self.visible_roi())
+        self.autofocus_worker.moveToThread(self.autofocus_thread)
+        self.autofocus_thread.started.connect(self.autofocus_worker.run)
+        self.autofocus_worker.progress.connect(self.handle_autofocus_progress)
+        self.autofocus_worker.finished.connect(self.handle_autofocus_finished)
+        self.autofocus_worker.finished.connect(self.autofocus_thread.quit)
+        self.autofocus_thread.finished.connect(self.handle_autofocus_thread_finished)
+        self.pushButton_autofocus.setText("Stop")
+        self.label_autofocus.setText("Autofocus : connecting..." if self.objective.io is None else "Autofocus...")
+        self.autofocus_thread.start()
+
+    def handle_autofocus_progress(self, current, score):
+        self.label_autofocus.setText(f"Autofocus : {current * 1000:.0f} mA, score {score:.1f}")
+
+    def handle_autofocus_finished(self, result):
+        if result is None:
+            self.label_autofocus.setText("Autofocus interrupted or failed (see console)")
+        else:
+            self.label_autofocus.setText(f"Focus : {result['current'] * 1000:.0f} mA "
+                                         f"({result['evaluations']} frames, {result['duration']:.1f} s)")
+        self.pushButton_autofocus.setText("Autofocus")
+        current = result["current"] if result is not None else self.autofocus_worker.last_current
+        if current is not None:
+            self.lensCurrentChanged.emit(self.objective_params["Lens"], current)
+        self.autofocus_worker = None
+
+    def handle_autofocus_thread_finished(self):
+        self.autofocus_thread.deleteLater()
+        self.autofocus_thread = None
+
     def closeEvent(self, event):
         """
         Événement déclenché lors de la fermeture de la fenêtre.
@@ -127,7 +347,17 @@ class CameraWidget(QWidget):
         Permet de s'assurer que le thread de capture est correctement arrêté
         pour éviter les fuites de mémoire ou les blocages de périphérique.
         """
+        if self.autofocus_thread is not None:
+            if self.autofocus_worker is not None:
+                self.autofocus_worker.stop()
+            self.autofocus_thread.quit()
+            self.autofocus_thread.wait()
         self.video_thread.stop()
+        if self.objective is not None:
+            self.objective.close_connection()
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
         event.accept()
 
 class VideoThread(QThread):
@@ -136,34 +366,168 @@ class VideoThread(QThread):
 
     Utilise un signal `change_pixmap_signal` pour transmettre les images
     à l’interface principale sans bloquer l'UI.
+
+    Une seule image est en transit à la fois : après un envoi, le thread attend
+    que l'interface appelle `frame_consumed` ; entre-temps les images de la
+    caméra sont seulement vidées du tampon (`grab`, sans décodage ni
+    conversion) et comptées dans `frames_dropped`. La dernière image arrivée
+    est donc toujours celle qui est affichée, rien ne s'accumule dans la file
+    d'événements, et la charge CPU suit la cadence d'affichage et non celle de
+    la caméra.
+
+    Pendant un enregistrement (start_recording), toutes les images sont lues
+    en pleine résolution et confiées au FrameRecorder, qui les copie dans
+    son pool et les écrit depuis son propre thread : ni la capture ni
+    l'affichage n'attendent le disque.
+
+    Le zoom et le déplacement sont appliqués ici (voir render_view) : seule
+    la région visible de l'image est redimensionnée vers la vue de taille
+    fixe, puis convertie en RGB directement dans l'un des `n_buffers`
+    tampons préalloués, utilisés à tour de rôle (pas d'allocation par
+    image) ; le QImage émis pointe dans ces tampons, sans copie.
+
+    Attributs :
+        current_frame (QImage) : Dernière vue envoyée.
+        view_size (Tuple[int, int]) : Taille (largeur, hauteur) de la vue.
+        frames_emitted (int) : Nombre d'images envoyées à l'interface.
+        frames_dropped (int) : Nombre d'images non affichées faute d'acquittement.
     """
     # Signal pour envoyer l'image capturée à l'interface
     change_pixmap_signal = pyqtSignal(QImage)
+    # Fin d'un enregistrement déclenché (nombre d'images atteint), avec son FrameRecorder
+    recording_finished = pyqtSignal(object)
 
-    def __init__(self):
+    def __init__(self, camera_index=0, n_buffers=3, view_size=(640, 480)):
         super().__init__()
         self._run_flag = True
+        self.camera_index = camera_index
+        self.n_buffers = n_buffers
+        self.view_size = view_size
+        self._view = (1.0, (0, 0))  # (zoom, position), remplacé d'un bloc par set_view
         self.current_frame = None
+        self.frames_emitted = 0
+        self.frames_dropped = 0
+        self._ready = threading.Event()
+        self._ready.set()
+        self._bgr = None  # tampon de lecture de cap.read (pleine résolution)
+        width, height = view_size
+        self._view_bgr = np.zeros((height, width, 3), dtype=np.uint8)
+        self._rgb_buffers = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(n_buffers)]
+        self._next_buffer = 0
+        self._recorder = None
+        self._record_remaining = None
+        self._frame_requests = []  # (instant minimal, Future) en attente, voir request_frame
+        self._requests_lock = threading.Lock()
+
+    def frame_consumed(self):
+        """À appeler par l'interface quand l'image reçue a été affichée."""
+        self._ready.set()
+
+    def set_view(self, zoom, position):
+        """
+        Change le zoom et la position de la vue (appliqués à partir de l'image suivante).
+
+        Args:
+            zoom (float): Facteur d'agrandissement.
+            position (Tuple[int, int]): Coin haut-gauche de la vue, en pixels de l'image agrandie.
+        """
+        self._view = (float(zoom), (int(position[0]), int(position[1])))
+
+    def start_recording(self, recorder, n_frames=None):
+        """
+        Confie les images suivantes à `recorder`.
+
+        Args:
+            recorder (FrameRecorder): Enregistreur qui reçoit les images.
+            n_frames (int): Nombre d'images à enregistrer (None = jusqu'à stop_recording) ;
+                `recording_finished` est émis une fois ce nombre atteint.
+        """
+        self._record_remaining = n_frames
+        self._recorder = recorder
+
+    def stop_recording(self):
+        """Arrête de confier les images à l'enregistreur (à terminer ensuite par recorder.stop)."""
+        self._recorder = None
+
+    def request_frame(self, not_before=None) -> Future:
+        """
+        Demande une copie de la prochaine image pleine résolution lue après `not_before`
+        (peut être appelée depuis n'importe quel thread).
+
+        Args:
+            not_before (float): Instant (time.time()) minimal de lecture ; None = prochaine image.
+
+        Returns:
+            Future: Donne (image BGR, instant de lecture).
+        """
+        future = Future()
+        with self._requests_lock:
+            self._frame_requests.append((not_before or 0.0, future))
+        return future
 
     def run(self):
         # Capturer la vidéo depuis la webcam
  
-        self.cap = cv2.VideoCapture(0)
+        self.cap = cv2.VideoCapture(self.camera_index)
   
         while self._run_flag:
-            ret, frame = self.cap.read()
-            if ret:
-                # Convertir l'image OpenCV (BGR) en QImage (RGB)
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = frame_rgb.shape
-                bytes_per_line = ch * w
-                q_img = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-                self.current_frame = q_img  # Stocker l'image actuelle
-                # Envoyer l'image à l'interface via le signal
-                self.change_pixmap_signal.emit(q_img)
+            recorder = self._recorder
+            if not self._ready.is_set() and recorder is None and not self._frame_requests:
+                # L'interface n'a pas fini avec l'image précédente : on vide le tampon de la
+                # caméra sans décoder (la prochaine image lue sera la plus récente)
+                if self.cap.grab():
+                    self.frames_dropped += 1
+                continue
+            ret, frame = self.cap.read(self._bgr)
+            if not ret:
+                continue
+            self._bgr = frame  # réutilisé à la lecture suivante
+            if self._frame_requests:
+                self._serve_requests(frame, time.time())
+            if recorder is not None:
+                # Copie dans le pool de l'enregistreur, sans attendre l'écriture
+                recorder.submit(frame, time.time())
+                if self._record_remaining is not None:
+                    self._record_remaining -= 1
+                    if self._record_remaining <= 0:
+                        self._recorder = None
+                        self.recording_finished.emit(recorder)
+            if not self._ready.is_set():
+                self.frames_dropped += 1  # enregistrée, mais pas affichée
+                continue
+            # Zoom et déplacement : seule la région visible est redimensionnée
+            zoom, position = self._view
+            render_view(frame, zoom, position, self._view_bgr)
+            frame_rgb = self._rgb_buffers[self._next_buffer]
+            self._next_buffer = (self._next_buffer + 1) % self.n_buffers
+            # Convertir la vue OpenCV (BGR) en RGB, directement dans le tampon
+            cv2.cvtColor(self._view_bgr, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+            h, w, ch = frame_rgb.shape
+            bytes_per_line = ch * w
+            q_img = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
+            self.current_frame = q_img  # Stocker l'image actuelle
+            # Envoyer l'image à l'interface via le signal
+            self._ready.clear()
+            self.frames_emitted += 1
+            self.change_pixmap_signal.emit(q_img)
 
         # Libérer la webcam lorsque le thread est arrêté
         self.cap.release()
+        with self._requests_lock:
+            requests, self._frame_requests = self._frame_requests, []
+        for _, future in requests:
+            future.cancel()
+
+    def _serve_requests(self, frame, timestamp):
+        """Répond aux demandes de request_frame dont l'instant minimal est passé."""
+        with self._requests_lock:
+            served = [(t, f) for t, f in self._frame_requests if t <= timestamp]
+            self._frame_requests = [(t, f) for t, f in self._frame_requests if t > timestamp]
+        if served:
+            copy = frame.copy()
+            for _, future in served:
+                if future.set_running_or_notify_cancel():
+                    future.set_result((copy, timestamp))
 
     def stop(self):
         """Arrêter le thread proprement."""
@@ -1,33 +1,136 @@
 import sys
+import time
 import numpy as np
 from PyQt6 import QtWidgets, QtCore
 import pyqtgraph as pg
 from scan import ScanGenerator
-from acq import NiDetectorAcquisition
+from acq import NiDetectorAcquisition, NiBufferedScan
 from power_supply import PowerSupply
+from scan_storage import ScanRecorder
+
+
+def write_pixels(frame: np.ndarray, scan: ScanGenerator, row: int,
+                 columns: np.ndarray, gray_values: np.ndarray) -> int:
+    """
+    Écrit une ligne de pixels dans l'image partagée.
+
+    En mode progressif, chaque pixel couvre tout son bloc jusqu'à la passe
+    suivante (toutes les colonnes d'une ligne appartiennent à la même passe).
+
+    Returns:
+        int: Nombre de lignes de l'image touchées à partir de `row`.
+    """
+    span = scan.pixel_span(row, int(columns[0]))
+    if span == 1:
+        frame[row, columns] = gray_values
+    else:
+        block_columns = (columns[:, None] + np.arange(span)).ravel()
+        inside = block_columns < frame.shape[1]
+        frame[row:row + span, block_columns[inside]] = np.repeat(gray_values, span)[inside]
+    return span
+
+
+class RunningLevels:
+    """
+    Statistiques de contraste tenues à jour au fil de l'acquisition.
+
+    Min/max courants et histogramme à nombre de cases fixe : ajouter un pixel
+    coûte O(1), et les niveaux d'affichage se calculent en O(n_bins), sans
+    reparcourir l'image.
+
+    Attributs :
+        clip_percent (float) : Pourcentage écrêté de chaque côté de l'histogramme
+            (0 = min/max bruts).
+    """
+    def __init__(self, value_range=(0.0, 255.0), n_bins: int = 256, clip_percent: float = 0.0):
+        self.low, self.high = value_range
+        self.n_bins = n_bins
+        self.clip_percent = clip_percent
+        self._scale = n_bins / (self.high - self.low)
+        self.histogram = np.zeros(n_bins, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        """Oublie toutes les valeurs accumulées (début d'une nouvelle image)."""
+        self.histogram[:] = 0
+        self.count = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def add(self, value: float):
+        """Ajoute un pixel."""
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        i_bin = min(self.n_bins - 1, max(0, int((value - self.low) * self._scale)))
+        self.histogram[i_bin] += 1
+        self.count += 1
+
+    def add_many(self, values: np.ndarray):
+        """Ajoute un ensemble de pixels (une ligne, par exemple)."""
+        if values.size == 0:
+            return
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        bins = ((values - self.low) * self._scale).astype(np.int64)
+        np.clip(bins, 0, self.n_bins - 1, out=bins)
+        self.histogram += np.bincount(bins, minlength=self.n_bins)
+        self.count += values.size
+
+    def levels(self):
+        """
+        Niveaux (noir, blanc) à appliquer à l'affichage.
+
+        Returns:
+            Tuple[float, float] ou None: Niveaux, ou None si aucun pixel n'a été acquis.
+        """
+        if self.count == 0:
+            return None
+        low, high = self.minimum, self.maximum
+        if self.clip_percent > 0:
+            cumulative = np.cumsum(self.histogram)
+            clip = self.count * self.clip_percent / 100
+            bin_width = 1 / self._scale
+            low = max(low, self.low + np.searchsorted(cumulative, clip, side="right") * bin_width)
+            high = min(high, self.low + (np.searchsorted(cumulative, self.count - clip) + 1) * bin_width)
+        if high <= low:
+            high = low + 1
+        return float(low), float(high)
 
 
 class AcquisitionWorker(QtCore.QObject):
-    pixel_acquired = QtCore.pyqtSignal(int, int, float)
+    """
+    Worker du mode série : une consigne X/Y par pixel, puis un bloc de lectures.
+
+    Les pixels sont écrits directement dans `frame`, partagé avec l'affichage
+    (et éventuellement projeté sur disque par `recorder`) ; seules les plages de
+    lignes modifiées sont signalées, au plus toutes les `notify_interval` secondes.
+    """
+    rows_updated = QtCore.pyqtSignal(int, int)  # première ligne, dernière ligne (exclue)
     finished = QtCore.pyqtSignal()
 
 
     def __init__(self, scan: ScanGenerator, alim: PowerSupply,
                  channel_x: int, channel_y: int,
-                 acquisition: NiDetectorAcquisition):
+                 acquisition: NiDetectorAcquisition,
+                 frame: np.ndarray, levels: RunningLevels = None,
+                 recorder: ScanRecorder = None,
+                 notify_interval: float = 1 / 30):
         super().__init__()
         self.scan = scan
         self.alim = alim
         self.channel_x = channel_x
         self.channel_y = channel_y
         self.acquisition = acquisition
+        self.frame = frame
+        self.levels = levels
+        self.recorder = recorder
+        self.notify_interval = notify_interval
         self._running = True
 
         self.resolution = self.scan.resolution
         self.samples_per_pixel = self.scan.samples_per_pixel
-        self.total_pixels = self.resolution * self.resolution
-        self.x_array = self.scan.get_x()
-        self.y_array = self.scan.get_y()
 
     def stop(self):
         #self._running = False
@@ -41,37 +144,114 @@ class AcquisitionWorker(QtCore.QObject):
         self.alim.set_voltage(0, channel=self.channel_y)
 
     def run(self):
-        sample_index = 0
-        for i_pixel in range(self.total_pixels):
+        first_row = last_row = None  # lignes modifiées depuis la dernière notification
+        last_notify = time.monotonic()
+        pixels_acquired = 0
+        completed = True
+        # Consignes générées à la volée : un point par pixel, pas par échantillon
+        for row, col, x, y in self.scan.iter_setpoints():
             if not self._running:
+                completed = False
                 break
 
-            i_start = sample_index
-            i_end = i_start + self.samples_per_pixel
-            if i_end > len(self.x_array):
+            # X et Y sont constants pendant tout le pixel : une consigne, puis un bloc de lectures
+            self.alim.set_currents({self.channel_x: x, self.channel_y: y}, wait=True)
+            voltages = self.acquisition.read_block(self.samples_per_pixel)
+            mean_gray = float(self.acquisition.gray_levels(voltages).mean())
+
+            if not self._running:
+                completed = False
                 break
 
-            gray_values = []
-            for idx in range(i_start, i_end):
-                if not self._running:
-                    break
-                x = self.x_array[idx]
-                y = self.y_array[idx]
+            # Échantillons bruts et pixel sont enregistrés ensemble (rien après un arrêt)
+            if self.recorder is not None:
+                self.recorder.write_raw(voltages)
+            # En mode progressif, le pixel couvre tout son bloc jusqu'à la passe suivante
+            span = self.scan.pixel_span(row, col)
+            self.frame[row:row + span, col:col + span] = mean_gray
+            if self.levels is not None:
+                self.levels.add(mean_gray)
+            pixels_acquired += 1
+            if first_row is None:
+                first_row, last_row = row, row + span
+            else:
+                first_row, last_row = min(first_row, row), max(last_row, row + span)
+
+            now = time.monotonic()
+            if now - last_notify >= self.notify_interval:
+                self.rows_updated.emit(first_row, last_row)
+                if self.recorder is not None:
+                    self.recorder.rows_written(first_row, last_row, pixels_acquired)
+                first_row = last_row = None
+                last_notify = now
+
+        if first_row is not None:
+            self.rows_updated.emit(first_row, last_row)
+        if self.recorder is not None:
+            self.recorder.rows_written(0, 0, pixels_acquired)
+            self.recorder.finish_frame(completed=completed)
+        self.finished.emit()
 
-                self.alim.set_current(x, channel=self.channel_x)
-                self.alim.set_current(y, channel=self.channel_y)
-                gray = self.acquisition.read_gray_level()
-                gray_values.append(gray)
 
-            if not self._running:
-                break
+class BufferedAcquisitionWorker(QtCore.QObject):
+    """
+    Worker du mode bufferisé : les signaux X/Y complets sont joués par
+    NiBufferedScan et le détecteur est lu ligne par ligne. La moyenne par pixel
+    se fait en un seul reshape sur le bloc de la ligne, écrit dans `frame`.
+    """
+    rows_updated = QtCore.pyqtSignal(int, int)  # première ligne, dernière ligne (exclue)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, scan: ScanGenerator, buffered: NiBufferedScan, frame: np.ndarray,
+                 levels: RunningLevels = None, recorder: ScanRecorder = None):
+        super().__init__()
+        self.scan = scan
+        self.buffered = buffered
+        self.frame = frame
+        self.levels = levels
+        self.recorder = recorder
+        self.pixels_acquired = 0
+        self._running = True
+
+        self.resolution = self.scan.resolution
+        self.samples_per_pixel = self.scan.samples_per_pixel
+        self.x_array = self.scan.get_x()
+        self.y_array = self.scan.get_y()
+        # (ligne, colonnes) de chaque bloc, dans l'ordre de balayage du motif
+        self.lines = list(self.scan.iter_lines())
 
-            mean_gray = sum(gray_values) / len(gray_values)
-            row = i_pixel // self.resolution
-            col = i_pixel % self.resolution
-            self.pixel_acquired.emit(row, col, mean_gray)
-            sample_index += self.samples_per_pixel
+    def stop(self):
+        """Demande l’arrêt du scan ; les sorties sont ramenées à 0 V par NiBufferedScan."""
+        self._running = False
+        self.buffered.stop()
+
+    def on_chunk(self, i_line: int, voltages: np.ndarray):
+        """Moyenne les échantillons d'une ligne et l'écrit dans l'image."""
+        row, columns = self.lines[i_line]
+        if self.recorder is not None:
+            self.recorder.write_raw(voltages)
+        means = voltages.reshape(len(columns), self.samples_per_pixel).mean(axis=1)
+        gray_values = self.buffered.voltages_to_gray(means)
+        span = write_pixels(self.frame, self.scan, row, columns, gray_values)
+        if self.levels is not None:
+            self.levels.add_many(gray_values)
+        self.pixels_acquired += len(columns)
+        self.rows_updated.emit(row, row + span)
+        if self.recorder is not None:
+            self.recorder.rows_written(row, row + span, self.pixels_acquired)
 
+    def run(self):
+        completed = False
+        try:
+            completed = self.buffered.acquire(
+                self.x_array, self.y_array,
+                chunk_sizes=[len(columns) * self.samples_per_pixel for _, columns in self.lines],
+                on_chunk=self.on_chunk
+            )
+        except Exception as e:
+            print("Erreur lors du scan bufferisé :", e)
+        if self.recorder is not None:
+            self.recorder.finish_frame(completed=completed)
         self.finished.emit()
 
 
@@ -85,7 +265,11 @@ class SEMImageLive(QtWidgets.QMainWindow):
     def __init__(self, scan: ScanGenerator, alim: PowerSupply,
                  channel_x: int, channel_y: int,
                  acquisition: NiDetectorAcquisition,
-                 image_view: pg.ImageView = None):
+                 image_view: pg.ImageView = None,
+                 buffered: NiBufferedScan = None,
+                 max_fps: float = 30.0,
+                 clip_percent: float = 0.0,
+                 recorder: ScanRecorder = None):
         super().__init__()
         self.setWindowTitle("SEM Image Live Viewer")
 
@@ -103,13 +287,17 @@ class SEMImageLive(QtWidgets.QMainWindow):
         self.channel_x = channel_x
         self.channel_y = channel_y
         self.acquisition = acquisition
+        # Si fourni, le scan est joué en mode bufferisé (AO/AI cadencées par le NI)
+        self.buffered = buffered
+        # Si fourni, chaque image est écrite sur disque au fil de l'acquisition
+        self.recorder = recorder
 
         self.resolution = self.scan.resolution
         self.samples_per_pixel = self.scan.samples_per_pixel
         self.total_pixels = self.resolution * self.resolution
 
         # Image  initiale (tout noir)
-        self.image = np.zeros((self.resolution, self.resolution), dtype=np.uint8)
+        self.image = np.zeros((self.resolution, self.resolution), dtype=np.float32)
         # Si le ImageView existait (dans ScanWidget), il affichait déjà quelque chose à l'init.
         # Sinon, on vient de créer un nouveau ImageView ci-dessus :
         self.image_view.setImage(self.image.T, autoLevels=True)
@@ -117,6 +305,15 @@ class SEMImageLive(QtWidgets.QMainWindow):
         self.worker = None
         self.thread = None
 
+        # Rafraîchissement de l'affichage à cadence bornée : le worker écrit dans
+        # self.image et signale seulement les lignes modifiées
+        self._dirty = False
+        # Contraste calculé incrémentalement à partir des pixels acquis
+        self.levels = RunningLevels(clip_percent=clip_percent)
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.setInterval(int(1000 / max_fps))
+        self.refresh_timer.timeout.connect(self.refresh_display)
+
         # Si on est en mode “fenêtre seule”, on propose des boutons Start/Stop.
         if image_view is None:
             button_layout = QtWidgets.QHBoxLayout()
@@ -146,40 +343,66 @@ class SEMImageLive(QtWidgets.QMainWindow):
         if self.worker is not None:
             self.worker = None
 
-        # Remise à zéro de l’image
-        self.image[:] = 0
+        # Remise à zéro de l’image (ou nouvelle image sur disque si enregistrement)
+        if self.recorder is not None:
+            self.image = self.recorder.start_frame(self.scan)
+        else:
+            self.image[:] = 0
         # AutoLevels True une fois pour recalculer les contrastes sur le 1er affichage
         self.image_view.setImage(self.image.T, autoLevels=True)
 
-        # Regénérer le scan XY
-        self.scan.generate()
-
-        # Créer worker et thread
-        self.worker = AcquisitionWorker(
-            scan=self.scan,
-            alim=self.alim,
-            channel_x=self.channel_x,
-            channel_y=self.channel_y,
-            acquisition=self.acquisition
-        )
+        # Seul le mode bufferisé a besoin des signaux XY complets ;
+        # le mode série génère ses consignes à la volée
+        if self.buffered is not None:
+            self.scan.generate()
+
+        # Créer worker et thread (ils écrivent directement dans self.image)
+        if self.buffered is not None:
+            self.worker = BufferedAcquisitionWorker(scan=self.scan, buffered=self.buffered,
+                                                    frame=self.image, levels=self.levels,
+                                                    recorder=self.recorder)
+        else:
+            self.worker = AcquisitionWorker(
+                scan=self.scan,
+                alim=self.alim,
+                channel_x=self.channel_x,
+                channel_y=self.channel_y,
+                acquisition=self.acquisition,
+                frame=self.image,
+                levels=self.levels,
+                recorder=self.recorder,
+                notify_interval=self.refresh_timer.interval() / 1000
+            )
         self.thread = QtCore.QThread()
         self.worker.moveToThread(self.thread)
 
-        self.worker.pixel_acquired.connect(self.update_image)
+        self.worker.rows_updated.connect(self.mark_rows_updated)
         self.worker.finished.connect(self.on_finished)
         self.thread.started.connect(self.worker.run)
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
 
-
+        self._dirty = False
+        self.levels.reset()
+        self.refresh_timer.start()
 
         self.thread.start()
 
-    def update_image(self, row: int, col: int, gray_value: float):
-        """Met à jour la valeur d’un pixel et rafraîchit l’affichage."""
-        self.image[row, col] = gray_value
-        self.image_view.imageItem.setImage(self.image.T, autoLevels=True)
+    def mark_rows_updated(self, first_row: int, last_row: int):
+        """Note que des lignes ont changé ; l'affichage suivra au prochain tick du timer."""
+        self._dirty = True
+
+    def refresh_display(self):
+        """Redessine l'image si elle a changé depuis le dernier affichage."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        levels = self.levels.levels()
+        if levels is None:
+            self.image_view.imageItem.setImage(self.image.T, autoLevels=False)
+        else:
+            self.image_view.imageItem.setImage(self.image.T, autoLevels=False, levels=levels)
 
     def stop(self):
         """Demande l’arrêt au worker et met à jour l’état des boutons."""
@@ -196,6 +419,8 @@ class SEMImageLive(QtWidgets.QMainWindow):
 
     def on_finished(self):
         """Exécuté quand le worker a émis `finished`."""
+        self.refresh_timer.stop()
+        self.refresh_display()
         # S'assurer que les courants sont bien à zéro
         self.alim.set_current(0, channel=self.channel_x)
         self.alim.set_current(0, channel=self.channel_y)
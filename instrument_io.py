@@ -0,0 +1,204 @@
+import queue
+import threading
+from concurrent.futures import Future
+import pyvisa
+from simulation import resolve_backend, SimulatedResourceManager
+
+
+class InstrumentIO:
+    """
+    Thread d'entrées/sorties propriétaire d'une session VISA.
+
+    Toutes les commandes destinées à l'instrument passent par une file et sont
+    exécutées, dans l'ordre, par un seul thread : plusieurs widgets (ou le
+    thread d'un scan) peuvent donc partager le même appareil sans se bloquer ni
+    entrelacer leurs échanges. Chaque appel retourne un `Future`.
+
+    Les écritures sans réponse sont mises en pipeline : les écritures
+    consécutives en attente dans la file sont envoyées en une seule trame
+    (commandes séparées par le terminateur), donc un seul aller-retour série.
+
+    Une session peut être partagée par plusieurs PowerSupply (voir
+    open_session) : l'état lié à l'appareil lui-même (dernières consignes,
+    réglages relus, identifiant) est donc porté par la session.
+
+    Attributs :
+        instr : Ressource pyvisa (ou simulée) déjà ouverte.
+        name (str) : Nom utilisé pour le thread et les messages.
+        max_batch (int) : Nombre maximal de commandes regroupées dans une écriture.
+        users (int) : Nombre d'utilisateurs de la session (registre de open_session).
+        identity (str) : Réponse à *IDN?, mémorisée par le premier utilisateur.
+        last_current (dict) : Dernière consigne ISET envoyée par canal.
+        settings_cache (dict) : Dernière lecture de réglages par canal.
+        commands_sent (int) : Commandes réellement envoyées par `write`.
+        writes_sent (int) : Écritures (trames) correspondantes, après regroupement.
+
+    Les compteurs ne sont modifiés que par le thread d'E/S ; les autres threads
+    peuvent les lire (statistiques) sans verrou.
+    """
+    _WRITE = "write"
+    _CALL = "call"
+    _STOP = "stop"
+
+    def __init__(self, instr, name: str = None, max_batch: int = 32):
+        self.instr = instr
+        self.name = name or str(getattr(instr, "resource_name", "instrument"))
+        self.max_batch = max_batch
+        self.users = 0
+        self.identity = None
+        self.last_current = {}
+        self.settings_cache = {}
+        self.commands_sent = 0
+        self.writes_sent = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"io-{self.name}", daemon=True)
+        self._thread.start()
+
+    def write(self, message: str) -> Future:
+        """Met une écriture en file ; le Future se termine quand elle a été envoyée."""
+        return self._put(self._WRITE, message)
+
+    def query(self, message: str) -> Future:
+        """Met une requête en file ; le Future donne la réponse (sans terminateur)."""
+        return self.submit(lambda instr: instr.query(message).strip())
+
+    def submit(self, function, *args) -> Future:
+        """
+        Exécute `function(instr, *args)` dans le thread d'E/S (échange en plusieurs
+        étapes qui ne doit pas être entrelacé avec d'autres commandes).
+        """
+        return self._put(self._CALL, (function, args))
+
+    def close(self, timeout: float = 5.0):
+        """Exécute les commandes en attente, ferme la ressource et arrête le thread."""
+        if self._closed:
+            return
+        self.submit(lambda instr: instr.close())
+        self._closed = True
+        self._queue.put((self._STOP, None, None))
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _put(self, kind: str, payload) -> Future:
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError(f"{self.name} : connexion fermée"))
+            return future
+        self._queue.put((kind, payload, future))
+        return future
+
+    def _run(self):
+        pending = None
+        while True:
+            job = pending if pending is not None else self._queue.get()
+            pending = None
+            kind, payload, future = job
+            if kind == self._STOP:
+                break
+            if kind == self._WRITE:
+                # Regroupe les écritures consécutives déjà en file
+                messages, futures = [payload], [future]
+                while len(messages) < self.max_batch:
+                    try:
+                        next_job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if next_job[0] != self._WRITE:
+                        pending = next_job
+                        break
+                    messages.append(next_job[1])
+                    futures.append(next_job[2])
+                futures = [f for f in futures if f.set_running_or_notify_cancel()]
+                if not futures:
+                    continue
+                try:
+                    self.instr.write(self.instr.write_termination.join(messages))
+                except Exception as e:
+                    for f in futures:
+                        f.set_exception(e)
+                else:
+                    self.writes_sent += 1
+                    self.commands_sent += sum(message.count(self.instr.write_termination) + 1
+                                              for message in messages)
+                    for f in futures:
+                        f.set_result(None)
+            else:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                function, args = payload
+                try:
+                    result = function(self.instr, *args)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+
+
+# Registre du processus : un ResourceManager par backend, une session par adresse
+_resource_managers = {}
+_sessions = {}
+_address_locks = {}
+_registry_lock = threading.Lock()
+
+
+def get_resource_manager(backend=None):
+    """
+    Retourne le ResourceManager partagé par tout le processus.
+
+    :param backend: "hardware" (pyvisa) ou "sim" ; None = variable d'environnement OPC_BACKEND
+    """
+    backend = resolve_backend(backend)
+    with _registry_lock:
+        if backend not in _resource_managers:
+            _resource_managers[backend] = (SimulatedResourceManager() if backend == "sim"
+                                           else pyvisa.ResourceManager())
+        return _resource_managers[backend]
+
+
+def open_session(address: str, resource_manager, configure=None) -> InstrumentIO:
+    """
+    Retourne la session ouverte sur `address`, en l'ouvrant au premier appel.
+
+    Les appels suivants réutilisent la même ressource (pas de réouverture du
+    port série) et incrémentent son compteur d'utilisateurs ; chaque appel doit
+    être suivi d'un `release_session`. Des adresses différentes peuvent être
+    ouvertes en parallèle.
+
+    :param address: Adresse VISA
+    :param resource_manager: ResourceManager utilisé pour la première ouverture
+    :param configure: Fonction appelée sur la ressource juste après son ouverture (optionnel)
+    """
+    with _registry_lock:
+        address_lock = _address_locks.setdefault(address, threading.Lock())
+    with address_lock:
+        session = _sessions.get(address)
+        if session is None or session.closed:
+            instr = resource_manager.open_resource(address)
+            try:
+                if configure is not None:
+                    configure(instr)
+            except Exception:
+                instr.close()
+                raise
+            session = InstrumentIO(instr, name=address)
+            _sessions[address] = session
+        session.users += 1
+        return session
+
+
+def release_session(session: InstrumentIO):
+    """Libère une session obtenue par open_session ; la ferme quand plus personne ne l'utilise."""
+    with _registry_lock:
+        address_lock = _address_locks.setdefault(session.name, threading.Lock())
+    with address_lock:
+        session.users -= 1
+        if session.users > 0:
+            return
+        if _sessions.get(session.name) is session:
+            del _sessions[session.name]
+    session.close()
@@ -0,0 +1,135 @@
+import math
+import time
+import numpy as np
+
+
+class LatencyHistogram:
+    """
+    Histogramme de latences à cases logarithmiques fixes.
+
+    Enregistrer une mesure coûte O(1) et la mémoire est constante ; les
+    percentiles sont approchés à la largeur d'une case près (~12 % avec
+    20 cases par décade).
+
+    Attributs :
+        count (int) : Nombre de mesures.
+        total (float) : Somme des durées (s).
+    """
+    def __init__(self, min_seconds: float = 1e-7, max_seconds: float = 100.0, bins_per_decade: int = 20):
+        self._log_min = math.log10(min_seconds)
+        self._bins_per_decade = bins_per_decade
+        n_bins = int(math.ceil((math.log10(max_seconds) - self._log_min) * bins_per_decade)) + 1
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        # Borne haute de chaque case (s)
+        self.edges = 10 ** (self._log_min + (np.arange(n_bins) + 1) / bins_per_decade)
+        self.reset()
+
+    def reset(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.first_time = None
+        self.last_time = None
+
+    def record(self, seconds: float, now: float = None):
+        """Ajoute une durée (s)."""
+        if seconds > 0:
+            i_bin = int((math.log10(seconds) - self._log_min) * self._bins_per_decade)
+            i_bin = min(len(self.counts) - 1, max(0, i_bin))
+        else:
+            i_bin = 0
+        self.counts[i_bin] += 1
+        self.count += 1
+        self.total += seconds
+        now = time.monotonic() if now is None else now
+        if self.first_time is None:
+            self.first_time = now
+        self.last_time = now
+
+    def percentile(self, q: float) -> float:
+        """Percentile `q` (0–100) des durées, en secondes (borne haute de la case)."""
+        if self.count == 0:
+            return 0.0
+        i_bin = int(np.searchsorted(np.cumsum(self.counts), self.count * q / 100))
+        return float(self.edges[min(i_bin, len(self.edges) - 1)])
+
+    def summary(self) -> dict:
+        """Nombre d'appels, débit et latences (ms)."""
+        if self.count == 0:
+            return {"calls": 0}
+        span = (self.last_time - self.first_time) if self.count > 1 else 0.0
+        return {
+            "calls": self.count,
+            "rate_per_s": (self.count - 1) / span if span > 0 else 0.0,
+            "mean_ms": self.total / self.count * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+        }
+
+
+class Profiler:
+    """
+    Compteurs de temps sur les appels du chemin critique du scan.
+
+    `attach` remplace une méthode d'instance (ex: `alim.set_currents`) par un
+    wrapper chronométré ; `detach_all` rend les méthodes d'origine. Quand rien
+    n'est attaché, aucun code d'instrumentation ne s'exécute : le coût est nul.
+
+    Exemple :
+        profiler = Profiler()
+        profiler.attach(alim, "set_currents", "serial")
+        ...
+        print(profiler.snapshot())
+        profiler.detach_all()
+    """
+    def __init__(self):
+        self.histograms = {}
+        self._attached = []  # (objet, nom de méthode)
+
+    @property
+    def enabled(self) -> bool:
+        """True si au moins une méthode est instrumentée."""
+        return bool(self._attached)
+
+    def attach(self, obj, method_name: str, counter: str = None):
+        """
+        Chronomètre chaque appel à `obj.method_name`.
+
+        :param obj: Instance à instrumenter
+        :param method_name: Nom de la méthode
+        :param counter: Nom du compteur (par défaut : nom de la méthode)
+        """
+        counter = counter or method_name
+        histogram = self.histograms.setdefault(counter, LatencyHistogram())
+        method = getattr(obj, method_name)
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                end = perf_counter()
+                histogram.record(end - start, end)
+
+        setattr(obj, method_name, timed)
+        self._attached.append((obj, method_name))
+
+    def detach_all(self):
+        """Retire tous les wrappers (les compteurs sont conservés)."""
+        for obj, method_name in reversed(self._attached):
+            try:
+                delattr(obj, method_name)
+            except AttributeError:
+                pass
+        self._attached.clear()
+
+    def reset(self):
+        """Remet tous les compteurs à zéro."""
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def snapshot(self) -> dict:
+        """Résumé de tous les compteurs : {nom: {calls, rate_per_s, mean_ms, p50_ms, ...}}."""
+        return {name: histogram.summary() for name, histogram in self.histograms.items()}
@@ -1,13 +1,29 @@
 import sys
 import os
+import importlib
 from PyQt6.QtWidgets import QApplication, QMainWindow
-from PyQt6 import uic
-from power_supply import PowerSupply
-from camera_widget_stand_alone import CameraWidget
-from multi_power_supply_stand_alone import MultiPowerSupplyWidget
-from scan_widget_stand_alone import ScanWidget
-from settings_stand_alone import SettingsWidget
-from PyQt6.QtCore import Qt
+from ui_cache import load_ui
+from PyQt6.QtCore import Qt, QTimer
+
+# Les fenêtres (et leurs dépendances lourdes : cv2, nidaqmx, pyvisa, pyqtgraph) ne sont
+# importées qu'à la première ouverture, ou préchargées après l'affichage, un module par
+# tour de la boucle d'événements (dans le thread graphique : ces modules créent des
+# objets Qt à l'import)
+WINDOW_MODULES = (
+    "multi_power_supply_stand_alone",
+    "scan_widget_stand_alone",
+    "camera_widget_stand_alone",
+    "settings_stand_alone",
+)
+
+
+def warm_up_modules(modules=WINDOW_MODULES):
+    """Importe les modules des fenêtres."""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Préchargement de {name} impossible :", e)
 
 # Chemin vers le fichier UI
 dossier_courant = os.path.dirname(os.path.abspath(__file__))
@@ -18,7 +34,7 @@ if not os.path.exists(ui_file):
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        uic.loadUi(ui_file, self)  # Charge les widgets promus automatiquement
+        load_ui(ui_file, self)  # Charge les widgets promus automatiquement
 
         self.pushButton_multi_power_supply.clicked.connect(self.open_power_supply)
         self.pushButton_camera.clicked.connect(self.open_camera)
@@ -36,12 +52,30 @@ class MainWindow(QMainWindow):
         self.scan_window = None
         self.power_supply_window = None
 
+        # Préchargement des fenêtres une fois la fenêtre principale affichée
+        self.modules_to_warm_up = list(WINDOW_MODULES)
+        QTimer.singleShot(200, self.warm_up_next)
+
+    def warm_up_next(self):
+        """
+        Importe le module de fenêtre suivant, puis rend la main à la boucle
+        d'événements avant le suivant : l'interface reste réactive entre deux
+        imports, et un clic pendant le préchargement est traité dès la fin de
+        l'import en cours.
+        """
+        if not self.modules_to_warm_up:
+            return
+        warm_up_modules([self.modules_to_warm_up.pop(0)])
+        QTimer.singleShot(0, self.warm_up_next)
+
     def open_camera(self):
         print("Camera")
         if self.camera_window is None:
+            from camera_widget_stand_alone import CameraWidget
             self.camera_window = CameraWidget()
             self.camera_window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)  # Libérer la mémoire à la fermeture
             self.camera_window.destroyed.connect(self.on_camera_closed)
+            self.camera_window.lensCurrentChanged.connect(self.on_lens_current_changed)
         self.camera_window.show()
         self.camera_window.raise_()
         self.camera_window.activateWindow()
@@ -49,10 +83,16 @@ class MainWindow(QMainWindow):
     def on_camera_closed(self):
         self.camera_window = None
 
+    def on_lens_current_changed(self, lens, current):
+        """Répercute sur la fenêtre des alimentations un courant réglé ailleurs (autofocus)."""
+        if self.power_supply_window is not None:
+            self.power_supply_window.sync_lens_current(lens, current)
+
 
     def open_power_supply(self):
         print("power")
         if self.power_supply_window is None:
+            from multi_power_supply_stand_alone import MultiPowerSupplyWidget
             self.power_supply_window = MultiPowerSupplyWidget()
             self.power_supply_window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)  # Libérer la mémoire à la fermeture
             self.power_supply_window.destroyed.connect(self.on_power_supply_closed)
@@ -76,6 +116,7 @@ class MainWindow(QMainWindow):
 
 
         if self.scan_window is None:
+            from scan_widget_stand_alone import ScanWidget
             self.scan_window = ScanWidget()
             self.scan_window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)  # Libérer la mémoire à la fermeture
             self.scan_window.destroyed.connect(self.on_scan_closed)
@@ -117,7 +158,7 @@ class MainWindow(QMainWindow):
       
     def open_settings(self):
         """Ouvre la fenêtre de configuration"""
-            
+        from settings_stand_alone import SettingsWidget
         self.settings_widget = SettingsWidget()  # Crée une nouvelle instance à chaque clic
         self.settings_widget.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
         self.settings_widget.show()
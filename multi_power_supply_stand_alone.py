@@ -2,12 +2,16 @@ import sys
 import os
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QApplication, QWidget
-from PyQt6 import uic
+from ui_cache import load_ui
 from power_supply import PowerSupply
 from power_supply_widget_stand_alone import PowerSupplyWidget
 import json
+import time
+import threading
 from collections import defaultdict
-from PyQt6.QtCore import pyqtSignal, QObject
+from concurrent.futures import Future, wait
+from PyQt6.QtCore import pyqtSignal, QObject, QThread
+from power_monitor import PowerSupplyMonitor, make_snapshot
 
 
 # Chemin vers le fichier UI
@@ -17,20 +21,58 @@ if not os.path.exists(ui_file):
     raise FileNotFoundError(f"UI introuvable : {ui_file}")
 
 
+def run_in_daemon_thread(function, *args, name=None) -> Future:
+    """
+    Exécute `function(*args)` dans un thread démon et retourne son Future.
+
+    Contrairement aux threads d'un ThreadPoolExecutor, un thread démon bloqué
+    (ouverture VISA qui ne répond pas) n'empêche pas l'application de se fermer.
+    """
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = function(*args)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=target, name=name, daemon=True).start()
+    return future
+
+
 class MultiPowerSupplyWidget(QWidget):
-    powerDataUpdated = pyqtSignal(dict)  # Signal unique pour les U et I toutes les alimentations
-    def __init__(self):
+    # Signal unique pour les U et I de toutes les alimentations : instantané en lecture seule
+    # {lentille: {lens, channel, voltage, current, timestamp, ...}} (voir power_monitor.make_snapshot)
+    powerDataUpdated = pyqtSignal(object)
+    def __init__(self, poll_interval=0.5, connect_timeout=5.0):
+        """
+        :param poll_interval: Période (s) du relevé de fond des alimentations (None = pas de relevé)
+        :param connect_timeout: Délai maximal (s) d'ouverture des connexions aux alimentations
+        """
         super().__init__()
-        uic.loadUi(ui_file, self)  # Charge les widgets promus automatiquement
+        load_ui(ui_file, self)  # Charge les widgets promus automatiquement
 
         self.power_widgets = []  # pour garder la liste des PowerSupplyWidget
+        self.supplies = {}  # {adresse: PowerSupply}
+        self.connected = {}  # {adresse: connexion ouverte au démarrage}
+        self.power_data = make_snapshot({})  # Dernier instantané des valeurs
         self.lineEdit_password.textChanged.connect(self.check_password)
         self.checkBox_admin.stateChanged.connect(self.toggle_admin_mode)
         self.power_supply_params = self.load_power_supply_params()
+        self.connect_timeout = connect_timeout
         self.create_power_supplies(self.power_supply_params)
 
         self.lineEdit_password.setVisible(False)
-        self.power_data = {}  # Dictionnaire pour stocker les dernières valeurs
+
+        # Relevé de fond de toutes les alimentations (hors du thread de l'interface)
+        self.monitor = None
+        self.monitor_thread = None
+        if poll_interval is not None:
+            self.start_monitor(poll_interval)
         
     def create_power_supplies(self, params):
         """Crée dynamiquement les alimentations et configure les widgets."""
@@ -56,11 +98,29 @@ class MultiPowerSupplyWidget(QWidget):
                 Vmin=Vmin, Vmax=Vmax,
                 Imin=Imin, Imax=Imax
             )
-            if alim.open_connection() is None:
-                raise RuntimeError(f"Connexion échouée pour l'alim {addr}")
-
             # on garde aussi un compteur de canal local à cette alim
-            supplies[addr] = {"instance": alim, "next_channel": 1}
+            supplies[addr] = {"instance": alim, "next_channel": 1, "connected": False}
+            self.supplies[addr] = alim
+
+        # Ouverture des connexions en parallèle : le démarrage dure autant que
+        # l'appareil le plus lent (au plus connect_timeout), pas la somme
+        # (les canaux d'une alim sont attribués dans l'ordre du JSON : 1, 2, ...).
+        # Threads démons : un port bloqué n'empêche pas la fermeture de l'application
+        futures = {run_in_daemon_thread(self.bring_up, info["instance"], len(groups[addr]),
+                                        name=f"connect-{addr}"): addr
+                   for addr, info in supplies.items()}
+        done, not_done = wait(futures, timeout=self.connect_timeout)
+        for future in done:
+            addr = futures[future]
+            supplies[addr]["connected"] = future.exception() is None and future.result() is not None
+            if not supplies[addr]["connected"]:
+                print(f"Connexion échouée pour l'alim {addr}")
+        self.connected = {addr: info["connected"] for addr, info in supplies.items()}
+        for future in not_done:
+            addr = futures[future]
+            print(f"Connexion à l'alim {addr} : pas de réponse après {self.connect_timeout} s")
+            # Si l'appareil finit par répondre, on libère le port : il reste en mode dégradé
+            future.add_done_callback(lambda f, alim=supplies[addr]["instance"]: alim.close_connection())
 
         # 3) Récupérer et trier les widgets promus
         widgets = self.findChildren(PowerSupplyWidget)
@@ -76,7 +136,8 @@ class MultiPowerSupplyWidget(QWidget):
             ch = info["next_channel"]
 
             widget.setup(channel=ch, alim=info["instance"], lens=entry["Lens"])
-            info["instance"].enable_output(channel=ch)
+            if not info["connected"]:
+                widget.set_connected(False)  # mode dégradé : seul ce widget est concerné
             info["next_channel"] += 1
             widget.setVisible(True)
 
@@ -92,6 +153,21 @@ class MultiPowerSupplyWidget(QWidget):
             widget.sliderValuesChanged.connect(self.handle_single_power_data)
         
     
+    @staticmethod
+    def bring_up(alim, n_channels):
+        """
+        Ouvre la connexion à une alimentation et active ses sorties (exécutée dans un thread du pool).
+
+        :param alim: PowerSupply à connecter
+        :param n_channels: Nombre de canaux utilisés (1 à n_channels)
+        :return: Nom de l'appareil, ou None si la connexion a échoué
+        """
+        name = alim.open_connection()
+        if name is not None:
+            for ch in range(1, n_channels + 1):
+                alim.enable_output(channel=ch)
+        return name
+
     ##FAIRE LES CREATION D'ALIMS ICI AU LIEU DE L'INIT
     def load_power_supply_params(self, filename='power_supplies_params.json'):
         """Charge les paramètres depuis le fichier JSON"""
@@ -143,16 +219,71 @@ class MultiPowerSupplyWidget(QWidget):
         """
         Stocke les données d'une alimentation et émet le signal global
         """
-        # Mettre à jour les données pour cette lentille
-        self.power_data[data['lens']] = data
-        
+        # Nouvel instantané : celui déjà publié n'est jamais modifié
+        entries = dict(self.power_data)
+        entries[data['lens']] = dict(data, timestamp=time.time())
+        self.power_data = make_snapshot(entries)
+
         # Émettre le signal avec toutes les données actuelles
         self.powerDataUpdated.emit(self.power_data)
 
+    def sync_lens_current(self, lens, current):
+        """
+        Met à jour le widget de `lens` après un réglage fait depuis une autre fenêtre.
+
+        :param lens: Nom de la lentille (power_supplies_params.json)
+        :param current: Courant de consigne (A)
+        """
+        for widget in self.power_widgets:
+            if widget.lens == lens:
+                widget.sync_current(current)
+
+    def start_monitor(self, interval):
+        """
+        Lance le relevé périodique de toutes les alimentations dans un QThread.
+
+        :param interval: Période de relevé (s)
+        """
+        # Seules les alims connectées au démarrage sont relevées (pas celles encore en cours d'ouverture)
+        channels = [(widget.lens, widget.alim, widget.channel) for widget in self.power_widgets
+                    if widget.alim is not None and self.connected.get(widget.alim.address, False)]
+        if not channels:
+            return
+        self.monitor = PowerSupplyMonitor(channels, interval=interval)
+        self.monitor_thread = QThread()
+        self.monitor.moveToThread(self.monitor_thread)
+        self.monitor.snapshot_ready.connect(self.handle_snapshot)
+        self.monitor_thread.started.connect(self.monitor.run)
+        self.monitor.finished.connect(self.monitor_thread.quit)
+        self.monitor_thread.start()
+
+    def stop_monitor(self):
+        """Arrête le relevé de fond et attend la fin de son thread."""
+        if self.monitor is not None:
+            self.monitor.stop()
+        if self.monitor_thread is not None:
+            self.monitor_thread.quit()
+            self.monitor_thread.wait()
+        self.monitor = None
+        self.monitor_thread = None
+
+    def handle_snapshot(self, snapshot):
+        """
+        Publie un relevé du moniteur (les lentilles absentes du relevé gardent leur dernière valeur).
+        """
+        entries = dict(self.power_data)
+        entries.update(snapshot)
+        self.power_data = make_snapshot(entries)
+        self.powerDataUpdated.emit(self.power_data)
+
 
     def closeEvent(self, event):
         # Ici vous pouvez ajouter du code avant la fermeture
         print("La fenêtre est sur le point de se fermer")
+        self.stop_monitor()
+        # Libération des alimentations (chaque port est fermé quand plus aucune fenêtre ne l'utilise)
+        for alim in self.supplies.values():
+            alim.close_connection()
         # self.alim_GPP2323.disable_output(channel=1)
         # self.alim_GPP2323.disable_output(channel=2)
         #self.alim_GPP1326.disable_output(channel=1)
@@ -0,0 +1,121 @@
+import time
+import threading
+from concurrent.futures import wait
+from types import MappingProxyType
+from collections import defaultdict
+from PyQt6 import QtCore
+
+
+def make_snapshot(entries) -> MappingProxyType:
+    """
+    Construit un instantané en lecture seule des mesures.
+
+    :param entries: Dictionnaire {lentille: dictionnaire de mesures}
+    :return: MappingProxyType {lentille: MappingProxyType(mesures)}
+    """
+    return MappingProxyType({lens: MappingProxyType(dict(values)) for lens, values in entries.items()})
+
+
+class PowerSupplyMonitor(QtCore.QObject):
+    """
+    Relève en tâche de fond la tension et le courant de sortie de toutes les alimentations.
+
+    Tous les canaux d'une même adresse sont lus en une seule transaction
+    (PowerSupply.get_channels_settings_async) et les différentes adresses sont
+    interrogées en parallèle (chacune a son propre thread d'E/S) : la durée
+    d'un relevé est celle de l'appareil le plus lent, pas leur somme. Le
+    relevé attend toutes les réponses jusqu'à une échéance unique et publie
+    celles qui sont arrivées ; une alimentation dont la requête précédente
+    est encore en attente n'est pas réinterrogée (pas d'accumulation de
+    requêtes dans la file d'un appareil lent). Chaque
+    relevé est publié par `snapshot_ready` sous forme d'un instantané en
+    lecture seule (voir make_snapshot), horodaté par canal.
+
+    À placer dans un QThread (moveToThread) puis lancer `run`.
+
+    Attributs :
+        channels (list) : Tuples (lentille, PowerSupply, canal) à relever (une alimentation
+            dont la connexion est fermée en est retirée au relevé suivant).
+        interval (float) : Période de relevé (s).
+    """
+    snapshot_ready = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, channels, interval: float = 0.5):
+        super().__init__()
+        self.channels = list(channels)
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._pending = {}  # {PowerSupply: Future du relevé pas encore terminé}
+
+    def stop(self):
+        """Demande l'arrêt de la boucle de relevé (peut être appelée depuis n'importe quel thread)."""
+        self._stop_event.set()
+
+    def poll(self):
+        """
+        Effectue un relevé de toutes les alimentations.
+
+        :return: Instantané {lentille: {lens, channel, address, voltage, current,
+                 voltage_set, current_set, timestamp}}
+        """
+        # Les alimentations dont la connexion a été fermée ne sont plus relevées
+        closed = {alim.address for _, alim, _ in self.channels if alim.io is None}
+        if closed:
+            print("Relevé arrêté pour", ", ".join(sorted(closed)), ": connexion fermée")
+            self.channels = [entry for entry in self.channels if entry[1].io is not None]
+            self._pending = {alim: future for alim, future in self._pending.items() if alim.io is not None}
+        # Regroupement par appareil : une transaction par adresse
+        groups = defaultdict(list)
+        for lens, alim, channel in self.channels:
+            groups[alim].append((lens, channel))
+        futures = {}
+        for alim, entries in groups.items():
+            previous = self._pending.get(alim)
+            if previous is not None and not previous.done():
+                futures[alim] = previous  # réponse attendue de nouveau, sans nouvelle requête
+                continue
+            try:
+                futures[alim] = alim.get_channels_settings_async([channel for _, channel in entries])
+            except Exception as e:
+                print(f"Relevé impossible pour {alim.address} :", e)
+        if not futures:
+            return make_snapshot({})
+
+        # Échéance unique pour toutes les alimentations
+        deadline = max(4 * alim.timeout / 1000 for alim in futures)
+        done, _ = wait(futures.values(), timeout=deadline)
+        entries = {}
+        for alim, future in futures.items():
+            if future not in done:
+                self._pending[alim] = future
+                continue
+            self._pending.pop(alim, None)
+            try:
+                settings = future.result()
+            except Exception as e:
+                print(f"Erreur lors du relevé de {alim.address} :", e)
+                continue
+            timestamp = time.time()
+            for lens, channel in groups[alim]:
+                values = settings[channel]
+                entries[lens] = {
+                    "lens": lens,
+                    "channel": channel,
+                    "address": alim.address,
+                    "voltage": values["Voltage Out"],
+                    "current": values["Current Out"],
+                    "voltage_set": values["Voltage Set"],
+                    "current_set": values["Current Set"],
+                    "timestamp": timestamp,
+                }
+        return make_snapshot(entries)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            snapshot = self.poll()
+            if snapshot:
+                self.snapshot_ready.emit(snapshot)
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
+        self.finished.emit()
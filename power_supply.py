@@ -1,5 +1,7 @@
 import pyvisa
 import time
+from simulation import resolve_backend
+from instrument_io import get_resource_manager, open_session, release_session
 
 class PowerSupply:
     """
@@ -11,6 +13,15 @@ class PowerSupply:
     - Configuration de communication série
     - Limites de tension et courant (Vmin/Vmax, Imin/Imax)
     - Canal actif (par défaut : 1)
+
+    Les échanges avec l'appareil passent par un thread d'E/S (InstrumentIO) :
+    les réglages (set_*, enable/disable_output) sont mis en file et retournent
+    un Future sans attendre ; les lectures (get_settings, query_mode) attendent
+    leur réponse, et ont une variante `*_async` qui retourne le Future.
+
+    Plusieurs PowerSupply sur la même adresse (ex: fenêtre de scan et fenêtre
+    des lentilles) partagent une seule session : le port n'est ouvert qu'une
+    fois, et fermé quand le dernier utilisateur appelle close_connection.
     """
     def __init__(self, 
                  connection_mode,      # "USB" ou "ETHERNET"
@@ -23,7 +34,9 @@ class PowerSupply:
                  Vmin=0.0, Vmax=5000,
                  Imin=0.0, Imax=1000,
                  name=None,
-                 channel =1): 
+                 channel =1,
+                 backend=None,
+                 settings_ttl=0.1): 
 
         """
         Initialise les paramètres de l'alimentation.
@@ -41,6 +54,9 @@ class PowerSupply:
         :param Imax: Courant maximal autorisé (mA)
         :param name: Nom de l'appareil (optionnel)
         :param channel: Canal actif par défaut
+        :param backend: "hardware" (pyvisa) ou "sim" (alimentation simulée) ;
+                        None = variable d'environnement OPC_BACKEND
+        :param settings_ttl: Durée de validité (s) des réglages lus par get_settings
         """          
         self.connection_mode = connection_mode
         self.address = address
@@ -57,45 +73,69 @@ class PowerSupply:
         
         self.name = name
         
-        self.rm = pyvisa.ResourceManager()
+        self.backend = resolve_backend(backend)
+        self.rm = get_resource_manager(self.backend)  # partagé par tout le processus
         self.instr = None  # instance de l'instrument
+        self.io = None  # session (thread d'E/S) partagée par adresse
 
         self.channel = channel
+        # Dernière consigne de courant envoyée par canal (chaîne formatée comme la commande)
+        # et dernière lecture de get_settings par canal : (instant de la requête, Future).
+        # Une fois connecté, ces dictionnaires sont ceux de la session partagée.
+        self.settings_ttl = settings_ttl
+        self._last_current = {}
+        self._settings_cache = {}
         
     def open_connection(self):
         """
         Ouvre la connexion à l'alimentation via PyVISA.
         Initialise les paramètres de communication et bascule l'appareil en mode distant.
         Récupère l'identifiant de l'appareil si non fourni.
+        Si l'adresse est déjà ouverte dans le processus, la session existante est réutilisée.
         :return: Nom de l'appareil connecté ou None en cas d'erreur
         """
+        if self.io is not None:
+            return self.name
         try:
-            self.instr = self.rm.open_resource(self.address)
-            self.instr.baud_rate = self.baud_rate
-            self.instr.data_bits = self.data_bits
-            self.instr.stop_bits = self.stop_bits
-            self.instr.parity = self.parity
-            self.instr.timeout = self.timeout
-            
+            self.io = open_session(self.address, self.rm, configure=self._configure)
+            self.instr = self.io.instr
+            self._last_current = self.io.last_current
+            self._settings_cache = self.io.settings_cache
+
             # Mettre l'alim en mode Remote si nécessaire
-            self.instr.write("SYSTem:REMote")
+            self.io.write("SYSTem:REMote")
             # Récupérer l'ID si non fourni
             if self.name is None:
-                self.name = self.instr.query("*IDN?").strip()
+                if self.io.identity is None:
+                    self.io.identity = self._wait(self.io.query("*IDN?"))
+                self.name = self.io.identity
             print(f"Connecté à {self.name}")
         except Exception as e:
             print("Erreur de connexion :", e)
             self.name = None 
+            self.close_connection()
 
         return self.name
 
+    def _configure(self, instr):
+        """Paramètres de communication, appliqués à l'ouverture du port."""
+        instr.baud_rate = self.baud_rate
+        instr.data_bits = self.data_bits
+        instr.stop_bits = self.stop_bits
+        instr.parity = self.parity
+        instr.timeout = self.timeout
+
     def close_connection(self):
         """
-        Ferme la connexion à l'instrument.
+        Libère la connexion à l'instrument ; le port est fermé (après envoi des
+        commandes en attente) quand plus aucun PowerSupply ne l'utilise.
         """
-        if self.instr:
-            self.instr.close()
-            self.instr = None
+        if self.io is not None:
+            release_session(self.io)
+            self.io = None
+        self.instr = None
+        self._last_current = {}
+        self._settings_cache = {}
 
     def set_voltage(self, voltage, channel=None):
         """
@@ -109,10 +149,8 @@ class PowerSupply:
         if voltage_mV < self.Vmin or voltage_mV > self.Vmax:
             print(f"Erreur: La tension doit être entre {self.Vmin/1000:.2f}V et {self.Vmax/1000:.2f}V.")
             return
-        try:
-            self.instr.write(f"VSET{channel}:{voltage:.3f}")
-        except Exception as e:
-            print("Erreur lors du réglage de la tension :", e)
+        self._settings_cache.pop(channel, None)
+        return self._write(f"VSET{channel}:{voltage:.3f}", "Erreur lors du réglage de la tension :")
 
     def set_current(self, current, channel=None):
         """
@@ -127,64 +165,186 @@ class PowerSupply:
             print(current_mA)
             print(f"Erreur: Le courant doit être entre {self.Imin/1000:.3f}A et {self.Imax/1000:.3f}A.")
             return
-        try:
-            self.instr.write(f"ISET{channel}:{current:.3f}")
-        except Exception as e:
-            print("Erreur lors du réglage du courant :", e)
+        value = f"{current:.3f}"
+        self._last_current[channel] = value
+        self._settings_cache.pop(channel, None)
+        return self._write(f"ISET{channel}:{value}", "Erreur lors du réglage du courant :",
+                           on_error=lambda: self._last_current.pop(channel, None))
+
+    def set_currents(self, currents, wait=False):
+        """
+        Définit le courant limite de plusieurs canaux en une seule écriture.
+
+        Les commandes ISET sont concaténées avec le terminateur de l'instrument.
+        Un canal dont la consigne (au mA près) est identique à la dernière
+        envoyée est ignoré ; si plus rien ne change, aucune écriture n'a lieu.
+
+        :param currents: Dictionnaire {canal: courant (A)}, ex: {1: 0.010, 2: 0.020}
+        :param wait: Attend que l'écriture soit envoyée (avant une mesure, par ex.)
+        :return: Future de l'écriture, ou None si rien n'a été envoyé
+        """
+        commands = []
+        sent = {}
+        for channel, current in currents.items():
+            current_mA = current * 1000
+            if current_mA < self.Imin or current_mA > self.Imax:
+                print(f"Erreur: Le courant doit être entre {self.Imin/1000:.3f}A et {self.Imax/1000:.3f}A.")
+                continue
+            value = f"{current:.3f}"
+            if self._last_current.get(channel) == value:
+                continue
+            commands.append(f"ISET{channel}:{value}")
+            sent[channel] = value
+        if not commands:
+            return None
+        self._last_current.update(sent)
+        for channel in sent:
+            self._settings_cache.pop(channel, None)
+
+        def forget_sent():
+            for channel in sent:
+                self._last_current.pop(channel, None)
+
+        future = self._write(commands, "Erreur lors du réglage des courants :", on_error=forget_sent)
+        if wait and future is not None:
+            try:
+                self._wait(future)
+            except Exception as e:
+                if not future.done():  # les erreurs d'envoi sont déjà signalées par _write
+                    print("Délai dépassé lors du réglage des courants :", e)
+        return future
       
-    def enable_output(self, channel=None ):
+    def enable_output(self, channel=None, timeout=1.0):
         """
-        Active la sortie du canal spécifié.
+        Active la sortie du canal spécifié et attend que l'appareil la confirme.
 
         :param channel: Numéro du canal ou "ALL" pour toutes les sorties
+        :param timeout: Délai maximal de confirmation (s)
+        :return: True si la sortie est confirmée active
         """
         channel = channel if channel is not None else self.channel
-        try:
-
-            if channel == "ALL":
-                self.instr.write("ALLOUTON")
-                print(f":ALL OUTPut:STATe ON")
-            else:
+        if channel == "ALL":
+            self._settings_cache.clear()
+            self._write("ALLOUTON", "Erreur lors de l'activation de la sortie :")
+            print(f":ALL OUTPut:STATe ON")
+            # Le canal actif sert de témoin pour l'ensemble des sorties
+            return self.wait_output_state(self.channel, True, timeout)
+        self._settings_cache.pop(channel, None)
+        self._write(f":OUTPut{channel}:STATe ON", "Erreur lors de l'activation de la sortie :")
+        print(f":OUTPut{channel}:STATe ON")
+        return self.wait_output_state(channel, True, timeout)
 
-                self.instr.write(f":OUTPut{channel}:STATe ON")
-                print(f":OUTPut{channel}:STATe ON")
-            time.sleep(0.1)
-        except Exception as e:
-            print("Erreur lors de l'activation de la sortie :", e)
-    
-    def disable_output(self, channel=None):
+    def disable_output(self, channel=None, timeout=1.0):
         """
-        Désactive la sortie du canal spécifié.
+        Désactive la sortie du canal spécifié et attend que l'appareil la confirme.
 
         :param channel: Canal à désactiver (défaut : canal actif)
+        :param timeout: Délai maximal de confirmation (s)
+        :return: True si la sortie est confirmée inactive
         """
-        try:
-          
-            self.instr.write(f":OUTPut{channel}:STATe OFF")
-            time.sleep(0.1)
-        except Exception as e:
-            print("Erreur lors de la désactivation de la sortie :", e)
-    
-    def get_settings(self, channel=None):
+        channel = channel if channel is not None else self.channel
+        self._settings_cache.pop(channel, None)
+        self._write(f":OUTPut{channel}:STATe OFF", "Erreur lors de la désactivation de la sortie :")
+        return self.wait_output_state(channel, False, timeout)
+
+    def wait_output_state(self, channel, enabled, timeout=1.0, interval=0.01):
         """
-        Récupère les réglages actuels et les valeurs mesurées de tension et de courant.
+        Interroge l'état de la sortie jusqu'à ce qu'il corresponde à `enabled`
+        (remplace une attente fixe après ON/OFF).
+
+        :param channel: Canal à surveiller
+        :param enabled: État attendu (True = ON)
+        :param timeout: Délai maximal (s)
+        :param interval: Pause entre deux interrogations (s)
+        :return: True si l'état attendu est atteint, False sinon
+        """
+        if self.io is None:
+            return False
+        expected = ("ON", "1") if enabled else ("OFF", "0")
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                state = self._wait(self.io.query(f":OUTPut{channel}:STATe?")).upper()
+                if state in expected:
+                    return True
+            except Exception as e:
+                print("Erreur lors de la lecture de l'état de la sortie :", e)
+                return False
+            if time.monotonic() >= deadline:
+                print(f"Sortie {channel} : état {state} au lieu de {expected[0]} après {timeout} s")
+                return False
+            time.sleep(interval)
+
+    def get_settings_async(self, channel=None):
+        """
+        Comme `get_settings`, sans attendre : retourne un Future du dictionnaire.
+
+        Les quatre requêtes (VSET?, ISET?, VOUT?, IOUT?) partent en une seule
+        écriture et les quatre réponses sont lues à la suite, dans la même
+        transaction du thread d'E/S. Une lecture de moins de `settings_ttl`
+        secondes (ou encore en cours) est réutilisée telle quelle ; tout
+        réglage du canal l'invalide.
 
         :param channel: Canal à interroger (défaut : canal actif)
-        :return: Dictionnaire avec les valeurs configurées et mesurées, ou None si erreur
         """
         channel = channel if channel is not None else self.channel
+        now = time.monotonic()
+        cached = self._settings_cache.get(channel)
+        if cached is not None:
+            requested, future = cached
+            if not future.done() or (now - requested <= self.settings_ttl and future.exception() is None):
+                return future
+
+        future = self._submit(lambda instr: self._read_settings(instr, [channel])[channel])
+        self._settings_cache[channel] = (now, future)
+        return future
+
+    def get_channels_settings_async(self, channels):
+        """
+        Relit les réglages de plusieurs canaux en une seule transaction (sans cache).
+
+        :param channels: Liste des canaux à interroger
+        :return: Future d'un dictionnaire {canal: réglages (comme get_settings)}
+        """
+        channels = list(channels)
+        return self._submit(lambda instr: self._read_settings(instr, channels))
+
+    def _read_settings(self, instr, channels):
+        """
+        Envoie VSET?/ISET?/VOUT?/IOUT? de tous les canaux en une seule écriture,
+        puis lit les réponses à la suite (exécutée dans le thread d'E/S).
+        """
+        queries = [f"{kind}{channel}?" for channel in channels for kind in ("VSET", "ISET", "VOUT", "IOUT")]
+        instr.write(instr.write_termination.join(queries))
         try:
-            voltage_set = self.instr.query(f"VSET{channel}?").strip()
-            current_set = self.instr.query(f"ISET{channel}?").strip()
-            voltage_out = self.instr.query(f"VOUT{channel}?").strip()  
-            current_out = self.instr.query(f"IOUT{channel}?").strip()  
-            return {
+            replies = [instr.read().strip() for _ in queries]
+        except Exception:
+            # Vide les réponses restantes pour ne pas décaler les lectures suivantes
+            instr.clear()
+            raise
+        settings = {}
+        for i, channel in enumerate(channels):
+            voltage_set, current_set, voltage_out, current_out = replies[4 * i:4 * i + 4]
+            settings[channel] = {
                 "Voltage Set": voltage_set,
                 "Current Set": current_set,
                 "Voltage Out": voltage_out,
                 "Current Out": current_out,
                 "Name": self.name
             }
+        return settings
+
+    def get_settings(self, channel=None):
+        """
+        Récupère les réglages actuels et les valeurs mesurées de tension et de courant.
+
+        Les réglages en file d'attente sont appliqués avant la lecture.
+
+        :param channel: Canal à interroger (défaut : canal actif)
+        :return: Dictionnaire avec les valeurs configurées et mesurées, ou None si erreur
+        """
+        try:
+            return dict(self._wait(self.get_settings_async(channel)))
         except Exception as e:
             print("Erreur lors de la récupération des réglages :", e)
             return None
@@ -204,6 +364,10 @@ class PowerSupply:
         return self.get_settings(ch)
     
     # D'autres méthodes utiles pourraient être ajoutées, par exemple :
+    def query_mode_async(self):
+        """Comme `query_mode`, sans attendre : retourne un Future de la réponse."""
+        return self._submit(lambda instr: instr.query("MODE?").strip())
+
     def query_mode(self):
         """
         Interroge le mode de fonctionnement actuel de l'alimentation.
@@ -211,8 +375,7 @@ class PowerSupply:
         :return: "CV" (tension constante), "CC" (courant constant), ou None si erreur
         """
         try:
-            mode = self.instr.query("MODE?").strip()
-            return mode
+            return self._wait(self.query_mode_async())
         except Exception as e:
             print("Erreur lors de la requête du mode :", e)
             return None
@@ -221,9 +384,44 @@ class PowerSupply:
         """
         Méthode pour désactiver les protections OVP et OCP si nécessaire.
         """
-        try:
-            self.instr.write("OVP OFF")
-            self.instr.write("OCP OFF")
-        except Exception as e:
-            print("Erreur lors de la désactivation des protections :", e)
-            
+        return self._write(["OVP OFF", "OCP OFF"], "Erreur lors de la désactivation des protections :")
+
+    def _write(self, commands, error_message, on_error=None):
+        """
+        Met une ou plusieurs commandes en file, sans attendre leur envoi.
+
+        Une erreur d'envoi est affichée (et `on_error` appelée) depuis le thread d'E/S.
+
+        :param commands: Commande, ou liste de commandes envoyées en une seule écriture
+        :param error_message: Préfixe du message en cas d'erreur
+        :param on_error: Fonction appelée en cas d'erreur (optionnel)
+        :return: Future de l'écriture, ou None si la connexion n'est pas ouverte
+        """
+        if self.io is None:
+            print(error_message, "connexion non ouverte")
+            if on_error is not None:
+                on_error()
+            return None
+        if not isinstance(commands, str):
+            commands = self.instr.write_termination.join(commands)
+        future = self.io.write(commands)
+
+        def report(done):
+            error = done.exception()
+            if error is not None:
+                if on_error is not None:
+                    on_error()
+                print(error_message, error)
+
+        future.add_done_callback(report)
+        return future
+
+    def _submit(self, function):
+        """Exécute `function(instr)` dans le thread d'E/S ; retourne son Future."""
+        if self.io is None:
+            raise RuntimeError("connexion non ouverte")
+        return self.io.submit(function)
+
+    def _wait(self, future):
+        """Attend le résultat d'un Future d'E/S (délai : quelques timeouts VISA)."""
+        return future.result(timeout=4 * self.timeout / 1000)
@@ -1,9 +1,10 @@
 import sys
 import os
+import time
 from PyQt6.QtWidgets import QApplication, QWidget, QButtonGroup
-from PyQt6 import uic
+from ui_cache import load_ui
 from power_supply import PowerSupply
-from PyQt6.QtCore import pyqtSignal, QObject
+from PyQt6.QtCore import pyqtSignal, QObject, QTimer
 
 # Définir le chemin du fichier UI
 dossier_courant = os.path.dirname(os.path.abspath(__file__))
@@ -12,10 +13,78 @@ qtCreatorFile = os.path.join(dossier_courant, "interface", "power_supply.ui")
 if not os.path.exists(qtCreatorFile):
     raise FileNotFoundError(f"Fichier UI introuvable : {qtCreatorFile}")
 
+class SetPointCoalescer(QObject):
+    """
+    Regroupe des demandes d'envoi rapprochées (ex: déplacement d'un slider) en
+    un seul envoi portant la dernière valeur.
+
+    Au plus un envoi toutes les 1/max_rate secondes, et jamais plus d'un
+    envoi en cours : tant que le précédent n'est pas terminé, les nouvelles
+    demandes se résument à « renvoyer la dernière valeur ». Une demande en
+    attente est toujours envoyée à terme ; `flush` l'envoie sans attendre le
+    délai (ex: au relâchement du slider).
+
+    Attributs :
+        send : Fonction sans argument qui envoie la dernière valeur et retourne
+               un Future (ou None si l'envoi est terminé immédiatement).
+        max_rate (float) : Nombre maximal d'envois par seconde.
+    """
+    _sent = pyqtSignal()  # émis depuis le thread d'E/S quand un envoi est terminé
+
+    def __init__(self, send, max_rate=20.0, parent=None):
+        super().__init__(parent)
+        self.send = send
+        self.max_rate = max_rate
+        self._pending = False
+        self._immediate = False
+        self._in_flight = False
+        self._last_send = float("-inf")
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._schedule)
+        self._sent.connect(self._on_sent)
+
+    def request(self):
+        """Demande l'envoi de la dernière valeur (au rythme maximal autorisé)."""
+        self._pending = True
+        self._schedule()
+
+    def flush(self):
+        """Envoie la dernière valeur dès que possible, sans attendre le délai."""
+        self._pending = True
+        self._immediate = True
+        self._schedule()
+
+    def _schedule(self):
+        if not self._pending or self._in_flight:
+            return
+        wait = 0.0 if self._immediate else self._last_send + 1.0 / self.max_rate - time.monotonic()
+        if wait > 0:
+            if not self._timer.isActive():
+                self._timer.start(int(wait * 1000) + 1)
+            return
+        self._timer.stop()
+        self._pending = self._immediate = False
+        self._last_send = time.monotonic()
+        try:
+            future = self.send()
+        except Exception as e:
+            print("Erreur lors de l'envoi de la consigne :", e)
+            return
+        if future is not None:
+            self._in_flight = True
+            future.add_done_callback(lambda done: self._sent.emit())
+
+    def _on_sent(self):
+        self._in_flight = False
+        self._schedule()
+
+
 class PowerSupplyWidget(QWidget):
     """Widget représentant l'interface de l'alimentation"""
     sliderValuesChanged = pyqtSignal(dict)  # Signal pour detecter les changements de valeur des sliders
-    def __init__(self, parent=None, channel=1, alim=None, lens = 'Lentille1'):
+    settingsReceived = pyqtSignal(dict)  # Réglages relus, émis depuis le thread d'E/S de l'alim
+    def __init__(self, parent=None, channel=1, alim=None, lens = 'Lentille1', max_rate=20.0):
         """
         Initialise le widget.
         
@@ -23,11 +92,25 @@ class PowerSupplyWidget(QWidget):
         :param channel: numéro de canal de l'alimentation
         :param alim: instance de PowerSupply existante, ou None pour en créer une nouvelle
         :param lens: étiquette associée à l’alimentation (ex: Lentille1)
+        :param max_rate: nombre maximal de consignes envoyées par seconde pendant un déplacement de slider
         """
         super().__init__(parent)
-        uic.loadUi(qtCreatorFile, self)  # Charger l'UI
+        load_ui(qtCreatorFile, self)  # Charger l'UI
         self.channel = channel
         self.lens = lens
+        # Les mouvements de slider sont regroupés : seule la dernière position est envoyée
+        self.coalescer = SetPointCoalescer(self.send_set_point, max_rate=max_rate, parent=self)
+        self.settingsReceived.connect(self.show_settings)
+        self.Slider_voltage.valueChanged.connect(self.update_voltage)
+        self.Slider_current.valueChanged.connect(self.update_current)
+        self.Slider_voltage.sliderReleased.connect(self.coalescer.flush)
+        self.Slider_current.sliderReleased.connect(self.coalescer.flush)
+        if alim is None and parent is not None:
+            # Widget promu (QtDesigner) : l'alim sera fournie par setup(), inutile d'ouvrir
+            # une connexion locale qui serait aussitôt remplacée
+            self.alim = None
+            self.set_connected(False)
+            return
         if alim is None:
             # Mode stand-alone : création locale d’une alimentation PowerSupply
             self.alim =  PowerSupply(
@@ -75,6 +158,7 @@ class PowerSupplyWidget(QWidget):
             self.label_device.setText(str(self.alim.name))
         else:
             self.label_device.setText("Appareil inconnu")
+        self.set_connected(self.alim.io is not None)
 
         self.label_channel.setText(str(self.channel))
         self.label_lens.setText(str(self.lens))
@@ -92,7 +176,8 @@ class PowerSupplyWidget(QWidget):
 
     def init_sliders(self):
         """
-        Initialise et connecte les sliders pour le contrôle de tension et de courant.
+        Initialise les sliders pour le contrôle de tension et de courant
+        (leurs signaux sont connectés une seule fois, dans __init__).
         """
 
         # Définir les valeurs min/max des sliders en fonction des valeurs de l'alimentation
@@ -101,9 +186,13 @@ class PowerSupplyWidget(QWidget):
         self.Slider_current.setMinimum(int(self.alim.Imin))
         self.Slider_current.setMaximum(int(self.alim.Imax))
 
-        # Initialiser les sliders aux valeurs minimales (IMPORTANT !)
+        # Initialiser les sliders aux valeurs minimales (IMPORTANT !), sans envoyer de consigne
+        self.Slider_voltage.blockSignals(True)
+        self.Slider_current.blockSignals(True)
         self.Slider_voltage.setValue(int(self.alim.Vmin))  # mV
         self.Slider_current.setValue(int(self.alim.Imin))  # mA
+        self.Slider_voltage.blockSignals(False)
+        self.Slider_current.blockSignals(False)
       
         # Initialiser les valeurs avec les minimums définis
         self.voltage_value = self.alim.Vmin / 1000
@@ -112,16 +201,6 @@ class PowerSupplyWidget(QWidget):
         self.label_Vset.setText(f"Voltage : {self.alim.Vmin/1000:.2f}V")
         self.label_Iset.setText(f"Courant : {self.alim.Imin/1000:.3f}A")
 
-        self.Slider_voltage.valueChanged.connect(self.update_voltage)
-        self.Slider_current.valueChanged.connect(self.update_current)
-        self.Slider_voltage.valueChanged.connect(self.on_slider_changed)
-        self.Slider_current.valueChanged.connect(self.on_slider_changed)
-
-     
-
-    def on_slider_changed(self):
-        """Déclenché par n'importe quel slider"""
-        self.update_settings()
     def update_voltage(self, value):
         """
         Callback lorsque le slider de tension est modifié.
@@ -140,33 +219,82 @@ class PowerSupplyWidget(QWidget):
 
     def update_settings(self):
         """
-        Met à jour les paramètres de l’alimentation et affiche les nouvelles valeurs.
+        Demande l'envoi des consignes courantes à l'alimentation.
+
+        Les demandes rapprochées sont regroupées (voir SetPointCoalescer) ; les
+        réglages relus sont affichés par `show_settings` à réception.
         """
-        updated_settings = self.alim.update_IV_set_point(
-        voltage_set_point=self.voltage_value,
-        current_set_point=self.current_value,
-        channel=self.channel 
-        )
-        
+        self.coalescer.request()
 
-        if updated_settings:
-            if updated_settings:
-                # Émet les nouvelles valeurs
-                self.sliderValuesChanged.emit({
-                    'lens': self.lens,
-                    'channel': self.channel,
-                    'voltage': updated_settings["Voltage Out"],
-                    'current': updated_settings["Current Out"]
-                })
+    def send_set_point(self):
+        """
+        Envoie la dernière consigne tension/courant puis demande la relecture des réglages.
 
+        :return: Future de la relecture
+        """
+        self.alim.set_voltage(self.voltage_value, self.channel)
+        self.alim.set_current(self.current_value, self.channel)
+        future = self.alim.get_settings_async(self.channel)
+        future.add_done_callback(self._deliver_settings)
+        return future
 
-            print("Réglages mis à jour :", updated_settings)
-            self.label_Vmeas.setText(f'{updated_settings["Voltage Out"]}')
-            self.label_Imeas.setText(f'{updated_settings["Current Out"]}')
-            self.label_Vset.setText(f'{updated_settings["Voltage Set"]}V')
-            self.label_Iset.setText(f'{updated_settings["Current Set"]}A')
+    def _deliver_settings(self, future):
+        """Transmet au thread de l'interface les réglages relus (appelée dans le thread d'E/S)."""
+        error = future.exception()
+        if error is not None:
+            print("Erreur lors de la récupération des réglages :", error)
+            return
+        self.settingsReceived.emit(dict(future.result()))
+
+    def show_settings(self, updated_settings):
+        """
+        Affiche les réglages relus et émet les nouvelles valeurs.
+
+        :param updated_settings: Dictionnaire retourné par PowerSupply.get_settings
+        """
+        # Émet les nouvelles valeurs
+        self.sliderValuesChanged.emit({
+            'lens': self.lens,
+            'channel': self.channel,
+            'voltage': updated_settings["Voltage Out"],
+            'current': updated_settings["Current Out"]
+        })
 
-       
+        print("Réglages mis à jour :", updated_settings)
+        self.label_Vmeas.setText(f'{updated_settings["Voltage Out"]}')
+        self.label_Imeas.setText(f'{updated_settings["Current Out"]}')
+        self.label_Vset.setText(f'{updated_settings["Voltage Set"]}V')
+        self.label_Iset.setText(f'{updated_settings["Current Set"]}A')
+
+    def sync_current(self, current):
+        """
+        Aligne le slider de courant sur une consigne envoyée par une autre fenêtre
+        (mise au point automatique, par ex.), sans la renvoyer, puis relit les réglages.
+
+        :param current: Courant de consigne (A)
+        """
+        self.Slider_current.blockSignals(True)
+        self.Slider_current.setValue(int(round(current * 1000)))  # mA
+        self.Slider_current.blockSignals(False)
+        self.current_value = current
+        self.label_Iset.setText(f"Courant : {current:.3f}A")
+        if self.alim is not None and self.alim.io is not None:
+            self.alim.get_settings_async(self.channel).add_done_callback(self._deliver_settings)
+
+    def set_connected(self, connected: bool):
+        """
+        Active les sliders si l'alimentation est connectée ; sinon le widget reste
+        affiché en mode dégradé (sliders désactivés, appareil signalé non connecté).
+
+        :param connected: True si la connexion à l'alimentation est ouverte
+        """
+        self.Slider_voltage.setEnabled(connected)
+        self.Slider_current.setEnabled(connected)
+        if not connected:
+            self.label_Vmeas.setText("--")
+            self.label_Imeas.setText("--")
+            if self.alim is not None:
+                self.label_device.setText(f"Non connecté ({self.alim.address})")
 
     def set_voltage_slider_visible(self, visible: bool):
         """
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Tampon circulaire numpy de capacité fixe (série temporelle pour les courbes).
+
+    Chaque valeur est écrite deux fois, en `i` et en `i + capacity`, dans un
+    tableau de 2 x capacity éléments : les `capacity` dernières valeurs sont
+    ainsi toujours contiguës et dans l'ordre quelque part dans ce tableau.
+    `view` retourne donc une vue ordonnée sans copie, et `append` est en O(1)
+    (deux écritures, aucune allocation). La mémoire est fixée à la création
+    (2 x capacity x taille du type), quelle que soit la durée d'acquisition.
+
+    Attributs :
+        capacity (int) : Nombre maximal de valeurs conservées.
+    """
+    def __init__(self, capacity: int, dtype=np.float64):
+        """
+        :param capacity: Nombre maximal de valeurs conservées (les plus anciennes sont écrasées)
+        :param dtype: Type numpy des valeurs
+        """
+        if capacity < 1:
+            raise ValueError("La capacité doit être d'au moins 1")
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        self._head = 0  # position de la prochaine écriture (0 <= head < capacity)
+        self._size = 0
+
+    def append(self, value):
+        """Ajoute une valeur (écrase la plus ancienne si le tampon est plein)."""
+        head = self._head
+        self._data[head] = value
+        self._data[head + self.capacity] = value
+        self._head = head + 1 if head + 1 < self.capacity else 0
+        if self._size < self.capacity:
+            self._size += 1
+
+    def extend(self, values):
+        """Ajoute plusieurs valeurs d'un coup (seules les `capacity` dernières sont gardées)."""
+        values = np.asarray(values, dtype=self._data.dtype).ravel()[-self.capacity:]
+        n = len(values)
+        if n == 0:
+            return
+        index = (self._head + np.arange(n)) % self.capacity
+        self._data[index] = values
+        self._data[index + self.capacity] = values
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def view(self) -> np.ndarray:
+        """
+        Valeurs de la plus ancienne à la plus récente, sans copie.
+
+        La vue est en lecture seule et reflète le tampon : elle n'est valable
+        que jusqu'au prochain ajout (la copier pour la conserver).
+        """
+        end = self._head + self.capacity
+        view = self._data[end - self._size:end]
+        view.flags.writeable = False
+        return view
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f"RingBuffer(capacity={self.capacity}, size={self._size}, dtype={self._data.dtype})"
@@ -1,5 +1,8 @@
 import numpy as np
-from typing import Tuple
+from typing import Tuple, Optional
+
+# Motifs de balayage disponibles
+SCAN_PATTERNS = ("raster", "serpentine", "interlaced", "progressive")
 
 class ScanGenerator:
     """
@@ -11,6 +14,10 @@ class ScanGenerator:
         max_current (float) : Valeur maximale du courant de consigne.
         resolution (int) : Nombre de pixels par ligne et par colonne.
         samples_per_pixel (int) : Nombre d’échantillons à collecter pour chaque pixel.
+        pattern (str) : Motif de balayage ("raster", "serpentine", "interlaced" ou "progressive").
+        interlace_step (int) : Pas entre les lignes d'une même passe en mode entrelacé.
+        progressive_levels (Tuple[int, ...]) : Pas des passes successives en mode progressif.
+        roi (Tuple) : Sous-région ((x_min, x_max), (y_min, y_max)) balayée, ou None.
         duration (float) : Durée totale du scan en secondes.
         sample_rate (float) : Taux d’échantillonnage en Hz.
         time_array (np.ndarray) : Tableau des temps associé aux signaux.
@@ -22,6 +29,10 @@ class ScanGenerator:
         current_range: Tuple[float, float],  # (min_current, max_current)
         resolution: int,                     # nombre de pixels (même pour h et v)
         samples_per_pixel: int,             # nombre d’échantillons par pixel
+        pattern: str = "raster",            # motif de balayage
+        interlace_step: int = 4,            # une ligne sur N par passe (mode entrelacé)
+        progressive_levels: Tuple[int, ...] = (8, 4, 2, 1),  # pas des passes (mode progressif)
+        roi: Optional[Tuple[Tuple[float, float], Tuple[float, float]]] = None,  # sous-région en courant
         ):
 
         """
@@ -31,10 +42,35 @@ class ScanGenerator:
             current_range (Tuple[float, float]): Plage de courant (min, max) pour X et Y.
             resolution (int): Nombre de pixels par ligne et colonne (image carrée).
             samples_per_pixel (int): Nombre d'échantillons à collecter par pixel.
+            pattern (str): "raster" (gauche à droite), "serpentine" (sens alterné
+                d'une ligne à l'autre, sans retour de ligne) ou "interlaced"
+                (une ligne sur `interlace_step` d'abord, pour un aperçu rapide)
+                ou "progressive" (passes de plus en plus fines, voir `progressive_levels`).
+            interlace_step (int): Pas du mode entrelacé.
+            progressive_levels (Tuple[int, ...]): Pas décroissants des passes du mode
+                progressif, chacun divisant le précédent et le dernier valant 1.
+                Avec (8, 4, 2, 1), la première passe acquiert 1 pixel sur 8 dans chaque
+                direction, et chaque passe suivante n'acquiert que les pixels manquants.
+            roi (Tuple): Sous-région ((x_min, x_max), (y_min, y_max)) à l'intérieur
+                de `current_range`, imagée avec toute la résolution. None = champ complet.
         """
+        if pattern not in SCAN_PATTERNS:
+            raise ValueError(f"Motif de balayage inconnu : {pattern} (attendu : {', '.join(SCAN_PATTERNS)})")
         self.min_current, self.max_current = current_range
         self.resolution = resolution
         self.samples_per_pixel = samples_per_pixel
+        self.pattern = pattern
+        self.interlace_step = max(1, interlace_step)
+        levels = tuple(progressive_levels)
+        if not levels or levels[-1] != 1 or any(
+                coarse % fine != 0 or coarse <= fine for coarse, fine in zip(levels, levels[1:])):
+            raise ValueError(f"Passes progressives invalides : {levels}")
+        self.progressive_levels = levels
+        if roi is not None:
+            for low, high in roi:
+                if not (self.min_current <= low < high <= self.max_current):
+                    raise ValueError(f"ROI {roi} hors de la plage de courant {current_range}")
+        self.roi = roi
         self.time_array = None
         self.x_signal = None
         self.y_signal = None
@@ -43,23 +79,18 @@ class ScanGenerator:
         """
         Génère les signaux de balayage X et Y pour un scan complet.
 
-        Le balayage suit un motif raster (ligne par ligne). Chaque ligne horizontale
-        est scannée de gauche à droite, et la position verticale change ensuite.
+        Les pixels sont parcourus dans l'ordre donné par `iter_lines()` (motif et
+        ROI compris) ; chaque consigne est répétée `samples_per_pixel` fois.
 
         Les signaux sont stockés dans `self.x_signal` et `self.y_signal`.
         """
-        # Génération X (balayage horizontal)
-        single_line = np.repeat(
-            np.linspace(self.min_current, self.max_current, self.resolution),
-            self.samples_per_pixel
-        )
-        self.x_signal = np.tile(single_line, self.resolution)
-        
-        # Génération Y (balayage vertical)
-        self.y_signal = np.repeat(
-            np.linspace(self.min_current, self.max_current, self.resolution),
-            self.samples_per_pixel * self.resolution
-        )
+        x_lines = []
+        y_lines = []
+        for row, columns, x_values, y in self.iter_setpoint_chunks():
+            x_lines.append(x_values)
+            y_lines.append(np.full(len(columns), y))
+        self.x_signal = np.repeat(np.concatenate(x_lines), self.samples_per_pixel)
+        self.y_signal = np.repeat(np.concatenate(y_lines), self.samples_per_pixel)
 
     def generate_horizontal_scan(self):
         """
@@ -84,6 +115,118 @@ class ScanGenerator:
             np.linspace(self.min_current, self.max_current, self.resolution),
             self.samples_per_pixel * self.resolution
         )
+    def x_axis(self):
+        """
+        Retourne les consignes X des colonnes (une valeur par pixel).
+        Returns:
+            np.ndarray: Courants X, de longueur `resolution`.
+        """
+        x_min, x_max = self.roi[0] if self.roi is not None else (self.min_current, self.max_current)
+        return np.linspace(x_min, x_max, self.resolution)
+
+    def y_axis(self):
+        """
+        Retourne les consignes Y des lignes (une valeur par pixel).
+        Returns:
+            np.ndarray: Courants Y, de longueur `resolution`.
+        """
+        y_min, y_max = self.roi[1] if self.roi is not None else (self.min_current, self.max_current)
+        return np.linspace(y_min, y_max, self.resolution)
+
+    def row_order(self):
+        """
+        Retourne l'ordre dans lequel les lignes sont balayées.
+        Returns:
+            np.ndarray: Indices de ligne, dans l'ordre d'acquisition.
+        """
+        if self.pattern == "interlaced":
+            return np.concatenate([
+                np.arange(offset, self.resolution, self.interlace_step)
+                for offset in range(min(self.interlace_step, self.resolution))
+            ])
+        return np.arange(self.resolution)
+
+    def iter_lines(self):
+        """
+        Parcourt les lignes dans l'ordre d'acquisition.
+
+        Quel que soit le motif, les indices (ligne, colonne) renvoyés sont ceux
+        de l'image finale : l'assemblage de l'image ne dépend pas du motif.
+        Yields:
+            Tuple[int, np.ndarray]: Indice de ligne et indices des colonnes,
+            dans l'ordre où elles sont balayées.
+        """
+        if self.pattern == "progressive":
+            yield from self._iter_progressive_lines()
+            return
+        columns = np.arange(self.resolution)
+        reversed_columns = columns[::-1]
+        for i_line, row in enumerate(self.row_order().tolist()):
+            if self.pattern == "serpentine" and i_line % 2 == 1:
+                yield row, reversed_columns
+            else:
+                yield row, columns
+
+    def _iter_progressive_lines(self):
+        """
+        Lignes du mode progressif : une passe par pas de `progressive_levels`.
+
+        Un pixel déjà acquis par une passe plus grossière n'est jamais rééchantillonné.
+        """
+        coarser = None
+        for step in self.progressive_levels:
+            columns = np.arange(0, self.resolution, step)
+            # Sur les lignes déjà visitées par la passe précédente, seules les
+            # colonnes intermédiaires sont nouvelles
+            new_columns = columns[columns % coarser != 0] if coarser is not None else columns
+            for row in range(0, self.resolution, step):
+                if coarser is not None and row % coarser == 0:
+                    if new_columns.size:
+                        yield row, new_columns
+                else:
+                    yield row, columns
+            coarser = step
+
+    def pixel_span(self, row: int, col: int) -> int:
+        """
+        Taille du bloc d'image représenté par un pixel au moment où il est acquis.
+
+        En mode progressif, un pixel de la passe de pas `s` est affiché sur un bloc
+        s×s, affiné ensuite par les passes suivantes. Ailleurs, vaut toujours 1.
+        Returns:
+            int: Côté du bloc, en pixels.
+        """
+        if self.pattern != "progressive":
+            return 1
+        for step in self.progressive_levels:
+            if row % step == 0 and col % step == 0:
+                return step
+        return 1
+
+    def iter_setpoint_chunks(self):
+        """
+        Génère les consignes ligne par ligne, sans matérialiser le scan complet.
+
+        La mémoire utilisée est en O(resolution), quel que soit `samples_per_pixel`.
+        Yields:
+            Tuple[int, np.ndarray, np.ndarray, float]: (ligne, colonnes, courants X, courant Y).
+        """
+        x_axis = self.x_axis()
+        y_axis = self.y_axis()
+        for row, columns in self.iter_lines():
+            yield row, columns, x_axis[columns], float(y_axis[row])
+
+    def iter_setpoints(self):
+        """
+        Génère les consignes pixel par pixel : un point par changement de consigne,
+        et non un point par échantillon.
+        Yields:
+            Tuple[int, int, float, float]: (ligne, colonne, courant X, courant Y).
+        """
+        for row, columns, x_values, y in self.iter_setpoint_chunks():
+            for col, x in zip(columns.tolist(), x_values.tolist()):
+                yield row, col, x, y
+
     # #Accès aux signaux générés par generate
     # def get_time(self):
     #     """
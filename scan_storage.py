@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import numpy as np
+from numpy.lib.format import open_memmap
+from scan import ScanGenerator
+
+
+class ScanRecorder:
+    """
+    Enregistre les images de scan sur disque au fil de l'acquisition.
+
+    Chaque image d'une session est un fichier `.npy` ouvert en `np.memmap` :
+    les workers écrivent directement dedans, l'image n'a donc jamais besoin de
+    tenir en RAM, et une série d'images se résume à une suite de fichiers.
+    Un fichier `metadata.json` décrit la session et chaque image (paramètres du
+    scan, horodatages, nombre de pixels acquis). Il est réécrit à chaque
+    synchronisation : après un plantage, les `pixels_acquired` premiers pixels
+    (dans l'ordre du motif de balayage) de la dernière image sont valides.
+
+    Optionnellement (`record_raw`), toutes les tensions brutes du détecteur sont
+    ajoutées, dans l'ordre d'acquisition, à un fichier binaire `frame_XXXX_raw.f64`
+    (float64 little-endian, `samples_per_pixel` valeurs par pixel) pour pouvoir
+    recalculer médianes, cartes de bruit, etc. sans refaire le scan.
+
+    Attributs :
+        directory (str) : Dossier de la session.
+        flush_interval (float) : Intervalle minimal (s) entre deux synchronisations disque.
+        record_raw (bool) : Enregistre aussi les échantillons bruts.
+    """
+    def __init__(self, directory: str, metadata: dict = None, flush_interval: float = 1.0,
+                 record_raw: bool = False):
+        """
+        Crée le dossier de la session et y écrit les métadonnées initiales.
+
+        Args:
+            directory (str): Dossier de la session (créé si besoin).
+            metadata (dict): Métadonnées communes à toute la session
+                (réglages des lentilles, opérateur...).
+            flush_interval (float): Intervalle minimal (s) entre deux synchronisations.
+            record_raw (bool): Enregistre aussi les tensions brutes de chaque échantillon.
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.record_raw = record_raw
+        os.makedirs(directory, exist_ok=True)
+        self.metadata = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "session": metadata or {},
+            "frames": [],
+        }
+        self.frame = None
+        self.raw_file = None
+        self._last_flush = 0.0
+        self._write_metadata()
+
+    def start_frame(self, scan: ScanGenerator) -> np.memmap:
+        """
+        Ouvre le fichier de la prochaine image de la série.
+
+        Args:
+            scan (ScanGenerator): Scan qui va remplir l'image.
+
+        Returns:
+            np.memmap: Image (float32, resolution × resolution, initialisée à 0)
+            dans laquelle les workers écrivent directement.
+        """
+        self.finish_frame(completed=False)
+        file_name = f"frame_{len(self.metadata['frames']):04d}.npy"
+        self.frame = open_memmap(os.path.join(self.directory, file_name), mode="w+",
+                                 dtype=np.float32, shape=(scan.resolution, scan.resolution))
+        raw_file_name = None
+        if self.record_raw:
+            raw_file_name = file_name.replace(".npy", "_raw.f64")
+            # Gros buffer d'écriture : un appel système pour de nombreux pixels
+            self.raw_file = open(os.path.join(self.directory, raw_file_name), "ab", buffering=1 << 20)
+        self.metadata["frames"].append({
+            "file": file_name,
+            "raw_file": raw_file_name,
+            "raw_dtype": "<f8" if raw_file_name else None,
+            "status": "in_progress",
+            "start": time.time(),
+            "end": None,
+            "pixels_acquired": 0,
+            "resolution": scan.resolution,
+            "samples_per_pixel": scan.samples_per_pixel,
+            "current_range": [scan.min_current, scan.max_current],
+            "pattern": scan.pattern,
+            "interlace_step": scan.interlace_step,
+            "progressive_levels": list(scan.progressive_levels),
+            "roi": scan.roi,
+        })
+        self._last_flush = time.monotonic()
+        self._write_metadata()
+        return self.frame
+
+    def write_raw(self, voltages: np.ndarray):
+        """
+        Ajoute des tensions brutes au fichier de l'image courante.
+
+        Le tableau est passé tel quel au buffer d'écriture (pas de copie ni de
+        boucle Python par échantillon). Sans effet si `record_raw` est faux.
+
+        Args:
+            voltages (np.ndarray): Tensions float64 contiguës, dans l'ordre d'acquisition.
+        """
+        if self.raw_file is not None:
+            self.raw_file.write(memoryview(np.ascontiguousarray(voltages, dtype="<f8")))
+
+    def rows_written(self, first_row: int, last_row: int, pixels_acquired: int):
+        """
+        Signale que des lignes ont été écrites dans l'image courante.
+
+        Appelée depuis le thread d'acquisition ; la synchronisation disque
+        n'a lieu qu'au plus toutes les `flush_interval` secondes.
+        """
+        if self.frame is None:
+            return
+        self.metadata["frames"][-1]["pixels_acquired"] = pixels_acquired
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._last_flush = now
+            self.frame.flush()
+            if self.raw_file is not None:
+                self.raw_file.flush()
+            self._write_metadata()
+
+    def finish_frame(self, completed: bool = True):
+        """
+        Termine l'image courante (s'il y en a une) et la synchronise sur disque.
+
+        Args:
+            completed (bool): False si le scan a été interrompu.
+        """
+        if self.frame is None:
+            return
+        self.frame.flush()
+        if self.raw_file is not None:
+            self.raw_file.close()
+            self.raw_file = None
+        info = self.metadata["frames"][-1]
+        info["status"] = "completed" if completed else "partial"
+        info["end"] = time.time()
+        self._write_metadata()
+        # Libère le mapping : l'image n'est plus référencée que sur disque
+        self.frame = None
+
+    def _write_metadata(self):
+        """Réécrit `metadata.json` de façon atomique (fichier temporaire puis remplacement)."""
+        path = os.path.join(self.directory, "metadata.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.metadata, f, indent=4)
+        os.replace(tmp_path, path)
+
+
+def load_frame(directory: str, index: int = -1):
+    """
+    Relit une image enregistrée sans la charger en mémoire.
+
+    Args:
+        directory (str): Dossier de la session.
+        index (int): Indice de l'image dans la série (-1 = la dernière).
+
+    Returns:
+        Tuple[np.memmap, dict]: Image en lecture seule et ses métadonnées.
+    """
+    with open(os.path.join(directory, "metadata.json"), "r") as f:
+        metadata = json.load(f)
+    info = metadata["frames"][index]
+    frame = np.load(os.path.join(directory, info["file"]), mmap_mode="r")
+    return frame, info
+
+
+def load_raw_samples(directory: str, index: int = -1):
+    """
+    Relit les échantillons bruts d'une image sans les charger en mémoire.
+
+    Args:
+        directory (str): Dossier de la session.
+        index (int): Indice de l'image dans la série (-1 = la dernière).
+
+    Returns:
+        Tuple[np.memmap, dict]: Tensions (pixels acquis × samples_per_pixel),
+        dans l'ordre d'acquisition, et métadonnées de l'image.
+    """
+    with open(os.path.join(directory, "metadata.json"), "r") as f:
+        metadata = json.load(f)
+    info = metadata["frames"][index]
+    if info.get("raw_file") is None:
+        raise FileNotFoundError(f"Pas d'échantillons bruts pour {info['file']}")
+    samples = np.memmap(os.path.join(directory, info["raw_file"]), dtype=info["raw_dtype"], mode="r")
+    n_pixels = samples.size // info["samples_per_pixel"]
+    return samples[:n_pixels * info["samples_per_pixel"]].reshape(n_pixels, info["samples_per_pixel"]), info
@@ -1,13 +1,20 @@
 import os
 import sys
 import os
+import json
+import time
 from PyQt6.QtWidgets import QApplication, QWidget, QButtonGroup
-from PyQt6 import uic
+from ui_cache import load_ui
+import numpy as np
+import pyqtgraph as pg
 from pyqtgraph import ImageView
 from image_viewer import SEMImageLive 
 from scan import ScanGenerator
 from power_supply import PowerSupply
-from acq import NiDetectorAcquisition
+from acq import NiDetectorAcquisition, NiBufferedScan
+from scan_storage import ScanRecorder
+from instrumentation import Profiler
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QVBoxLayout
 # Définir le chemin du fichier UI (interface graphique)
 dossier_courant = os.path.dirname(os.path.abspath(__file__))
@@ -32,10 +39,14 @@ class ScanWidget(QWidget):
         Initialise l'interface graphique et les périphériques nécessaires.
         """
         super().__init__(parent)
-        uic.loadUi(qtCreatorFile, self)  # Charger l'UI
+        load_ui(qtCreatorFile, self)  # Charger l'UI
         # Connexion des boutons de contrôle
         self.pushButton_start.clicked.connect(self.start_scan)
         self.pushButton_stop.clicked.connect(self.stop_scan)
+        self.checkBox_roi.toggled.connect(self.toggle_roi)
+        self.checkBox_stats.toggled.connect(self.toggle_stats)
+        # Les échantillons bruts ne sont enregistrés qu'avec la sauvegarde des scans
+        self.checkBox_save.toggled.connect(lambda checked: self.checkBox_raw.setEnabled(checked))
     
         # Initialisation de l'alimentation
         self.adresse_alim__GPP2323 = "ASRL5::INSTR"
@@ -55,7 +66,24 @@ class ScanWidget(QWidget):
         # Initialiser l'acquisition simulée #####ATTENTION CHANGER POUR ACQUISITION REELE ######
         #self.acquisition = NiDetectorAcquisition(response_time=0.001)
         self.acquisition = NiDetectorAcquisition(channel_read="Dev2/ai1")#, response_time=0.001)
+        # Mode bufferisé (sorties AO "Dev2/ao0:1" vers l'étage de commande des bobines),
+        # créé à la première utilisation
+        self.buffered_scan = None
+        # Sélection de ROI sur l'image courante et dernier scan (pour convertir pixels -> courants)
+        self.roi_item = None
+        self.roi_axes = None  # consignes (X, Y) de l'image sur laquelle la ROI a été tracée
+        self.last_scan = None
+        # Enregistrement sur disque : une session (dossier) par fenêtre, créée au premier scan
+        self.recorder = None
         self.sem_viewer = None
+        # Statistiques en direct : chronométrage des appels du chemin critique, installé
+        # seulement quand la case est cochée (aucun surcoût sinon)
+        self.profiler = Profiler()
+        self.scan_start_time = None
+        self.commands_at_start = 0  # compteur de commandes de la session au début du scan
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setInterval(500)
+        self.stats_timer.timeout.connect(self.update_stats)
         # Désactiver certains éléments de l'interface tant qu'aucun scan n'est lancé
         self.update_ui_state(scanning=False)
 
@@ -89,8 +117,23 @@ class ScanWidget(QWidget):
             current_range=self.current_range,
             resolution=self.resolution,
             samples_per_pixel=self.samples_per_pixel,
+            pattern=self.comboBox_pattern.currentText(),
+            roi=self.roi_to_currents(),
             )
-        scan.generate()
+        self.last_scan = scan
+
+        buffered = None
+        if self.checkBox_buffered.isChecked():
+            if self.buffered_scan is None:
+                self.buffered_scan = NiBufferedScan(channels_write="Dev2/ao0:1", channel_read="Dev2/ai1")
+            buffered = self.buffered_scan
+
+        recorder = None
+        if self.checkBox_save.isChecked():
+            if self.recorder is None:
+                self.recorder = self.create_recorder()
+            self.recorder.record_raw = self.checkBox_raw.isChecked()
+            recorder = self.recorder
 
         # Créer le viewer SEM (acquisition + affichage)
         self.sem_viewer = SEMImageLive(
@@ -99,12 +142,151 @@ class ScanWidget(QWidget):
             channel_x=1,
             channel_y=2,
             acquisition=self.acquisition,
-            image_view=self.image_view
+            image_view=self.image_view,
+            buffered=buffered,
+            recorder=recorder
         )
         # Connexion du signal de fin de scan
         self.sem_viewer.scan_completed.connect(self.handle_scan_finished)#signal envoyé par SEM_ImageLive
+        self.scan_start_time = time.monotonic()
+        self.commands_at_start = self.alim.io.commands_sent if self.alim.io is not None else 0
+        self.toggle_stats(self.checkBox_stats.isChecked())
         self.sem_viewer.start()
 
+    def toggle_stats(self, checked: bool):
+        """
+        Installe ou retire les compteurs de temps sur l'alimentation, le détecteur
+        et l'affichage du scan en cours.
+
+        Args:
+            checked (bool): True pour activer les statistiques.
+        """
+        self.profiler.detach_all()
+        if not checked or self.sem_viewer is None or self.scan_start_time is None:
+            self.stats_timer.stop()
+            return
+        self.profiler.reset()
+        self.profiler.attach(self.alim, "set_currents", "setpoint")
+        self.profiler.attach(self.acquisition, "read_block", "detector")
+        self.profiler.attach(self.image_view.imageItem, "setImage", "redraw")
+        self.stats_timer.start()
+
+    def update_stats(self):
+        """
+        Met à jour le résumé : pixels/s, commandes série/s, temps restant et latences p95.
+
+        Les commandes/s sont celles réellement envoyées à l'alimentation (compteur de
+        la session, InstrumentIO.commands_sent) : les consignes inchangées, que
+        set_currents n'envoie pas, ne sont pas comptées. Le mode bufferisé n'envoie
+        aucune commande série pendant le scan.
+        """
+        if self.sem_viewer is None or self.scan_start_time is None:
+            return
+        elapsed = time.monotonic() - self.scan_start_time
+        pixels = self.sem_viewer.levels.count
+        total = self.last_scan.resolution ** 2
+        pixels_per_s = pixels / elapsed if elapsed > 0 else 0.0
+        remaining = (total - pixels) / pixels_per_s if pixels_per_s > 0 else None
+        stats = self.profiler.snapshot()
+        commands = (self.alim.io.commands_sent - self.commands_at_start) if self.alim.io is not None else 0
+        commands_per_s = commands / elapsed if elapsed > 0 else 0.0
+        lines = [
+            f"{pixels_per_s:.0f} px/s  |  {commands_per_s:.0f} cmd/s  |  "
+            + (f"reste {remaining:.0f} s" if remaining is not None else "reste --")
+        ]
+        latencies = [f"{name} p95 {summary['p95_ms']:.2f} ms"
+                     for name, summary in stats.items() if summary["calls"]]
+        if latencies:
+            lines.append("  |  ".join(latencies))
+        self.label_stats.setText("\n".join(lines))
+
+    def toggle_roi(self, checked: bool):
+        """
+        Affiche ou retire le rectangle de sélection de ROI sur l'image.
+
+        Args:
+            checked (bool): True pour afficher le rectangle.
+        """
+        view = self.image_view.getView()
+        if checked and self.roi_item is None:
+            size = self.spinBox_reso.value()
+            if self.last_scan is not None:
+                size = self.last_scan.resolution
+            self.roi_item = pg.RectROI([size / 4, size / 4], [size / 2, size / 2], pen="y")
+            view.addItem(self.roi_item)
+            self.roi_axes = self.scan_axes(self.last_scan)
+        elif not checked and self.roi_item is not None:
+            view.removeItem(self.roi_item)
+            self.roi_item = None
+            self.roi_axes = None
+
+    @staticmethod
+    def scan_axes(scan):
+        """Consignes (X, Y) des pixels de l'image d'un scan, ou None."""
+        if scan is None:
+            return None
+        return scan.x_axis(), scan.y_axis()
+
+    def roi_to_currents(self):
+        """
+        Convertit le rectangle de sélection (en pixels de l'image sur laquelle il a
+        été tracé) en sous-région de courant pour le prochain scan.
+
+        La correspondance pixels -> courants est celle de l'image affichée quand la
+        ROI a été tracée (ou de la première image obtenue ensuite) : relancer un
+        scan sans déplacer le rectangle rebalaye la même région, au lieu de zoomer
+        à nouveau dans le résultat précédent. Pour zoomer dans la nouvelle image,
+        décocher puis recocher la ROI.
+
+        Returns:
+            Tuple ou None: ((x_min, x_max), (y_min, y_max)) en A, ou None si aucune ROI
+            n'est active, si elle est vide ou s'il n'y a pas encore d'image.
+        """
+        if self.roi_item is None:
+            return None
+        if self.roi_axes is None:
+            self.roi_axes = self.scan_axes(self.last_scan)
+        if self.roi_axes is None:
+            print("ROI ignorée : aucune image de référence, scan du champ complet.")
+            return None
+        x_axis, y_axis = self.roi_axes
+        (x0, y0), (width, height) = self.roi_item.pos(), self.roi_item.size()
+        # L'image est affichée transposée : x = colonne, y = ligne
+        x_min, x_max = np.interp([x0, x0 + width], np.arange(len(x_axis)), x_axis)
+        y_min, y_max = np.interp([y0, y0 + height], np.arange(len(y_axis)), y_axis)
+        low, high = self.current_range
+        x_min, x_max = max(low, x_min), min(high, x_max)
+        y_min, y_max = max(low, y_min), min(high, y_max)
+        if x_min >= x_max or y_min >= y_max:
+            print("ROI vide ou hors de la plage de courant : scan du champ complet.")
+            return None
+        return (float(x_min), float(x_max)), (float(y_min), float(y_max))
+
+    def create_recorder(self):
+        """
+        Crée la session d'enregistrement dans "scans/<date>_<heure>".
+
+        Les réglages des lentilles (power_supplies_params.json) sont joints aux
+        métadonnées de la session.
+
+        Returns:
+            ScanRecorder: Enregistreur de la session.
+        """
+        directory = os.path.join(dossier_courant, "scans", time.strftime("%Y%m%d_%H%M%S"))
+        lenses = None
+        params_path = os.path.join(dossier_courant, "power_supplies_params.json")
+        try:
+            with open(params_path, "r") as f:
+                lenses = json.load(f)
+        except Exception as e:
+            print("Réglages des lentilles non disponibles :", e)
+        print(f"Enregistrement des scans dans {directory}")
+        return ScanRecorder(directory, metadata={
+            "scan_power_supply": self.adresse_alim__GPP2323,
+            "detector_channel": self.acquisition.channel_read,
+            "lenses": lenses,
+        })
+
     def stop_scan(self):
         """
         Stoppe le scan en cours si un viewer est actif.
@@ -121,6 +303,12 @@ class ScanWidget(QWidget):
         Réactive les contrôles dans l’interface.
         """
         self.update_ui_state(scanning=False)
+        if self.profiler.enabled:
+            self.update_stats()
+            print("Statistiques du scan :", self.profiler.snapshot())
+        self.stats_timer.stop()
+        self.profiler.detach_all()
+        self.scan_start_time = None
         print("Scan terminé (signal reçu)")
       
     def update_ui_state(self, scanning: bool):
@@ -133,14 +321,24 @@ class ScanWidget(QWidget):
         self.doubleSpinBox_currrent_range.setEnabled(not scanning)
         self.spinBox_reso.setEnabled(not scanning)
         self.spinBox_sample_per_pix.setEnabled(not scanning)
+        self.checkBox_buffered.setEnabled(not scanning)
+        self.comboBox_pattern.setEnabled(not scanning)
+        self.checkBox_roi.setEnabled(not scanning)
+        self.checkBox_save.setEnabled(not scanning)
+        self.checkBox_raw.setEnabled(not scanning and self.checkBox_save.isChecked())
         self.pushButton_start.setEnabled(not scanning)
         self.pushButton_stop.setEnabled(scanning)
 
     def closeEvent(self, event):
         """
-        Gestion de la fermeture de la fenêtre : arrête le scan proprement.
+        Gestion de la fermeture de la fenêtre : arrête le scan proprement, puis
+        libère l'alimentation (le port est fermé si aucune autre fenêtre ne l'utilise).
         """
         self.stop_scan()
+        # Fin de scan encore en file (remise à zéro des courants) : traitée avant la libération
+        QApplication.sendPostedEvents()
+        self.stats_timer.stop()
+        self.alim.close_connection()
         event.accept()
 
 if __name__ == "__main__":
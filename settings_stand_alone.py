@@ -2,7 +2,7 @@ from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QComboBox, 
                             QPushButton, QWidget, QApplication, QMessageBox)
 import os
-from PyQt6 import uic
+from ui_cache import load_ui
 import sys
 import json
 
@@ -23,7 +23,7 @@ class SettingsWidget(QWidget):
         et initialise la liste d'alimentations.
         """
         super().__init__(parent)
-        uic.loadUi(ui_file, self)
+        load_ui(ui_file, self)
         self.pushButton_add_power_supply.clicked.connect(self.add_power_supply)
         self.pushButton_Finish.clicked.connect(self.finish)
         self.pushButton_preview.clicked.connect(self.preview_power_supplies)
@@ -0,0 +1,276 @@
+import os
+import re
+import time
+import threading
+import numpy as np
+
+# Backend par défaut des instruments : "hardware" (pyvisa / nidaqmx) ou "sim".
+# Se choisit par la variable d'environnement OPC_BACKEND, ou instrument par instrument
+# avec l'argument `backend` de PowerSupply, NiDetectorAcquisition et NiBufferedScan.
+DEFAULT_BACKEND = os.environ.get("OPC_BACKEND", "hardware")
+# Latence simulée par transaction série (s) : délai d'aller-retour USB-série de chaque écriture/lecture
+DEFAULT_COMMAND_LATENCY = float(os.environ.get("OPC_SIM_LATENCY", "0.002"))
+# Temps simulé de décodage d'une commande par l'appareil (s)
+DEFAULT_PARSE_TIME = float(os.environ.get("OPC_SIM_PARSE_TIME", "0.0005"))
+
+
+def resolve_backend(backend=None) -> str:
+    """
+    Retourne le backend effectif ("hardware" ou "sim").
+
+    :param backend: Backend demandé, ou None pour la valeur de OPC_BACKEND
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in ("hardware", "sim"):
+        raise ValueError(f"Backend inconnu : {backend} (attendu : hardware ou sim)")
+    return backend
+
+
+class SimulatedGPP:
+    """
+    Modèle d'une alimentation GW Instek GPP, avec l'interface d'une ressource pyvisa
+    (write / query / read / close et attributs de communication série).
+
+    Coût simulé d'un échange :
+        - `command_latency` par écriture et par lecture (aller-retour série),
+        - la transmission des octets : 10 bits par octet (8N1) à `baud_rate`,
+        - `parse_time` par commande décodée par l'appareil.
+    Plusieurs commandes envoyées dans un seul `write` (séparées par le
+    terminateur) ne paient qu'une seule fois la latence, mais chacune paie ses
+    octets et son décodage : le gain du regroupement reste réaliste.
+
+    Attributs :
+        address (str) : Adresse VISA simulée.
+        n_channels (int) : Nombre de canaux.
+        command_latency (float) : Latence par écriture/lecture (s).
+        parse_time (float) : Temps de décodage par commande (s).
+        counters (dict) : Nombre d'écritures, de lectures et de commandes traitées.
+    """
+    _SET = re.compile(r"^(VSET|ISET)(\d):([-+0-9.eE]+)$")
+    _GET = re.compile(r"^(VSET|ISET|VOUT|IOUT)(\d)\?$")
+    _OUTPUT = re.compile(r"^:OUTP(?:ut)?(\d):STAT(?:e)?\s+(ON|OFF)$", re.IGNORECASE)
+    _OUTPUT_GET = re.compile(r"^:OUTP(?:ut)?(\d):STAT(?:e)?\?$", re.IGNORECASE)
+
+    def __init__(self, address: str, n_channels: int = 2, model: str = "GPP-2323",
+                 command_latency: float = DEFAULT_COMMAND_LATENCY, parse_time: float = DEFAULT_PARSE_TIME):
+        self.address = address
+        self.n_channels = n_channels
+        self.model = model
+        self.command_latency = command_latency
+        self.parse_time = parse_time
+
+        # Attributs attendus par PowerSupply.open_connection (baud_rate fixe aussi la durée de transmission)
+        self.baud_rate = 115200
+        self.data_bits = 8
+        self.stop_bits = None
+        self.parity = None
+        self.timeout = 2000
+        self.write_termination = "\n"
+        self.read_termination = "\n"
+
+        self.voltage_set = {ch: 0.0 for ch in range(1, n_channels + 1)}
+        self.current_set = {ch: 0.0 for ch in range(1, n_channels + 1)}
+        self.output_on = {ch: False for ch in range(1, n_channels + 1)}
+        self.load_ohms = 10.0  # charge résistive (bobine) sur chaque sortie
+        self.counters = {"writes": 0, "reads": 0, "commands": 0}
+        self._responses = []
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def write(self, message: str):
+        """Traite une ou plusieurs commandes séparées par le terminateur d'écriture."""
+        commands = [command.strip() for command in message.split(self.write_termination)]
+        commands = [command for command in commands if command]
+        time.sleep(self.command_latency + self.transmission_time(message + self.write_termination)
+                   + len(commands) * self.parse_time)
+        with self._lock:
+            self.counters["writes"] += 1
+            for command in commands:
+                self._execute(command)
+
+    def read(self) -> str:
+        """Retourne la plus ancienne réponse en attente."""
+        with self._lock:
+            self.counters["reads"] += 1
+            response = self._responses.pop(0) + self.read_termination if self._responses else None
+        if response is None:
+            time.sleep(self.command_latency)
+            raise TimeoutError(f"{self.address} : aucune réponse en attente (timeout simulé)")
+        time.sleep(self.command_latency + self.transmission_time(response))
+        return response
+
+    def transmission_time(self, data: str) -> float:
+        """Durée de transmission (s) de `data` sur la ligne série : 10 bits par octet (8N1)."""
+        return len(data.encode()) * 10 / self.baud_rate
+
+    def query(self, message: str) -> str:
+        """Écrit une requête et retourne sa réponse."""
+        self.write(message)
+        return self.read()
+
+    def clear(self):
+        """Vide les réponses en attente (équivalent d'un device clear VISA)."""
+        with self._lock:
+            self._responses.clear()
+
+    def close(self):
+        self.closed = True
+
+    def measured(self, channel: int):
+        """
+        Tension et courant de sortie simulés (source limitée en tension ou en courant).
+
+        :return: Tuple (V, A)
+        """
+        if not self.output_on[channel]:
+            return 0.0, 0.0
+        current = min(self.current_set[channel], self.voltage_set[channel] / self.load_ohms)
+        return current * self.load_ohms, current
+
+    def _execute(self, command: str):
+        """Applique une commande (appelée sous verrou)."""
+        self.counters["commands"] += 1
+        match = self._SET.match(command)
+        if match:
+            kind, channel, value = match.group(1), int(match.group(2)), float(match.group(3))
+            target = self.voltage_set if kind == "VSET" else self.current_set
+            target[channel] = value
+            return
+        match = self._GET.match(command)
+        if match:
+            kind, channel = match.group(1), int(match.group(2))
+            voltage, current = self.measured(channel)
+            self._responses.append({
+                "VSET": f"{self.voltage_set[channel]:.3f}",
+                "ISET": f"{self.current_set[channel]:.3f}",
+                "VOUT": f"{voltage:.3f}V",
+                "IOUT": f"{current:.3f}A",
+            }[kind])
+            return
+        match = self._OUTPUT.match(command)
+        if match:
+            self.output_on[int(match.group(1))] = match.group(2).upper() == "ON"
+            return
+        match = self._OUTPUT_GET.match(command)
+        if match:
+            self._responses.append("ON" if self.output_on[int(match.group(1))] else "OFF")
+            return
+        if command == "ALLOUTON":
+            for channel in self.output_on:
+                self.output_on[channel] = True
+        elif command == "ALLOUTOFF":
+            for channel in self.output_on:
+                self.output_on[channel] = False
+        elif command == "*IDN?":
+            self._responses.append(f"GW INSTEK,{self.model},SIM-{self.address},V1.00")
+        elif command == "MODE?":
+            self._responses.append("CV")
+        # SYSTem:REMote, OVP OFF, OCP OFF... : acceptées sans effet
+
+
+# Instruments simulés du processus, partagés par adresse (comme un vrai port série)
+_instruments = {}
+_instruments_lock = threading.Lock()
+
+
+def get_simulated_instrument(address: str) -> SimulatedGPP:
+    """Retourne l'alimentation simulée associée à `address` (créée au premier appel)."""
+    with _instruments_lock:
+        if address not in _instruments:
+            _instruments[address] = SimulatedGPP(address)
+        return _instruments[address]
+
+
+class SimulatedResourceManager:
+    """Remplace `pyvisa.ResourceManager` : chaque adresse ouvre une SimulatedGPP."""
+
+    def open_resource(self, address: str):
+        instrument = get_simulated_instrument(address)
+        instrument.closed = False
+        return instrument
+
+    def list_resources(self):
+        with _instruments_lock:
+            return tuple(_instruments)
+
+
+class SyntheticSpecimen:
+    """
+    Échantillon de test rendu à partir des consignes X/Y (A) : un réseau de disques
+    de tailles croissantes sur un fond en gradient, plus du bruit de détecteur.
+
+    Attributs :
+        field (float) : Courant correspondant à la largeur totale du champ (A).
+        noise (float) : Écart type du bruit ajouté (V).
+    """
+    def __init__(self, field: float = 0.1, noise: float = 0.05,
+                 min_voltage: float = 0.0, max_voltage: float = 10.0, seed: int = 0):
+        self.field = field
+        self.noise = noise
+        self.min_voltage = min_voltage
+        self.max_voltage = max_voltage
+        self.rng = np.random.default_rng(seed)
+
+    def render(self, x, y) -> np.ndarray:
+        """
+        Tension détecteur aux positions (x, y), vectorisé.
+
+        :param x: Courant(s) X (A)
+        :param y: Courant(s) Y (A)
+        :return: Tensions (V), même forme que `x`
+        """
+        u = np.asarray(x, dtype=np.float64) / self.field
+        v = np.asarray(y, dtype=np.float64) / self.field
+        # Cellules de 1/8 du champ, disques de rayon croissant avec u
+        cell_u = (u * 8) % 1.0 - 0.5
+        cell_v = (v * 8) % 1.0 - 0.5
+        radius = 0.15 + 0.25 * np.clip(u, 0.0, 1.0)
+        inside = cell_u ** 2 + cell_v ** 2 < radius ** 2
+        voltage = 1.0 + 2.0 * np.clip(v, 0.0, 1.0) + 6.0 * inside
+        if self.noise > 0:
+            voltage = voltage + self.rng.normal(0.0, self.noise, voltage.shape)
+        return np.clip(voltage, self.min_voltage, self.max_voltage)
+
+
+class SimulatedDetectorTask:
+    """
+    Remplace la tâche nidaqmx du détecteur : chaque lecture rend le spécimen au
+    point défini par les consignes ISET actuelles de l'alimentation de scan simulée.
+
+    Fournit à la fois `read()` (comme `nidaqmx.Task`) et `read_many_sample()`
+    (comme `AnalogSingleChannelReader`).
+
+    Attributs :
+        scan_address (str) : Adresse de l'alimentation simulée des bobines X/Y.
+        channels (Tuple[int, int]) : Canaux X et Y de cette alimentation.
+        sample_period (float) : Durée simulée d'un échantillon (s).
+    """
+    def __init__(self, specimen: SyntheticSpecimen = None, scan_address: str = "ASRL5::INSTR",
+                 channels=(1, 2), sample_period: float = 1e-5):
+        self.specimen = specimen or SyntheticSpecimen()
+        self.scan_address = scan_address
+        self.channels = channels
+        self.sample_period = sample_period
+        self.counters = {"reads": 0, "samples": 0}
+
+    def _render(self, n: int) -> np.ndarray:
+        supply = get_simulated_instrument(self.scan_address)
+        x = np.full(n, supply.current_set[self.channels[0]])
+        y = np.full(n, supply.current_set[self.channels[1]])
+        if self.sample_period > 0:
+            time.sleep(n * self.sample_period)
+        self.counters["reads"] += 1
+        self.counters["samples"] += n
+        return self.specimen.render(x, y)
+
+    def read(self, number_of_samples_per_channel=None):
+        if number_of_samples_per_channel is None:
+            return float(self._render(1)[0])
+        return self._render(number_of_samples_per_channel).tolist()
+
+    def read_many_sample(self, data: np.ndarray, number_of_samples_per_channel: int, timeout: float = 10.0):
+        data[:number_of_samples_per_channel] = self._render(number_of_samples_per_channel)
+        return number_of_samples_per_channel
+
+    def close(self):
+        pass
@@ -0,0 +1,33 @@
+import functools
+from PyQt6 import uic
+
+
+@functools.lru_cache(maxsize=None)
+def load_ui_type(ui_file: str):
+    """
+    Compile un fichier .ui en classe de formulaire, une seule fois par processus.
+
+    :param ui_file: Chemin du fichier .ui
+    :return: Classe de formulaire (celle de `uic.loadUiType`)
+    """
+    form_class, _ = uic.loadUiType(ui_file)
+    return form_class
+
+
+def load_ui(ui_file: str, widget):
+    """
+    Remplace `uic.loadUi(ui_file, widget)` : construit l'interface dans `widget`
+    à partir de la classe compilée en cache, sans relire ni réanalyser le
+    fichier .ui à chaque ouverture de fenêtre.
+
+    Comme avec loadUi, les éléments de l'interface deviennent des attributs du widget.
+
+    :param ui_file: Chemin du fichier .ui
+    :param widget: Widget à remplir
+    :return: Le widget
+    """
+    form = load_ui_type(ui_file)()
+    form.setupUi(widget)
+    for name, value in vars(form).items():
+        setattr(widget, name, value)
+    return widget